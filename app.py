@@ -1,16 +1,46 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, date, timedelta, timezone
+import functools
 import json
 import os
-from database.db_utils import DatabaseManager
-#from utils.payment import PaymentManager
+import tempfile
+from database.db_utils import (
+    DatabaseManager, InsufficientStockError, ACTIVE_STATUSES, PENDING_PAYMENT,
+    PAYMENT_FAILED, HOLD_TTL_MINUTES
+)
+from database.scheduler import Scheduler, default_jobs
+from utils.payment import PaymentProcessor, make_gateway
+from utils.reconcile import reconcile
+from database.instrumentation import STATS
+from database.menu_io import CATEGORIES, MENU_COLUMNS, parse_menu_file
 from components.ui import (
     display_menu, display_cart, display_order_status,
-    display_order_history, display_analytics
+    display_order_history, display_analytics,
+    display_pager, get_page_cursor, reset_pages, format_order_items,
+    display_prep_queue, display_menu_filters, display_offset_pager,
+    get_page_offset, reset_offset
 )
 
+# Rows per page for paged order lists
+ORDERS_PAGE_SIZE = 20
+
+# Items per page of the student menu and the admin item list
+MENU_PAGE_SIZE = 15
+
+# Seconds between automatic refreshes of the staff incoming-orders list
+STAFF_REFRESH_SECONDS = 5
+
+# Seconds between refreshes of a student's active orders (payment confirmation)
+STUDENT_REFRESH_SECONDS = 3
+
+# Minutes a failed payment stays listed under Active Orders
+FAILED_PAYMENT_NOTICE_MINUTES = 30
+
+# Seconds the admin trend charts are reused across reruns
+TRENDS_TTL_SECONDS = 60
+
 # Configure Streamlit page
 st.set_page_config(
     page_title="Smart Canteen System",
@@ -29,61 +59,43 @@ if 'username' not in st.session_state:
 if 'cart' not in st.session_state:
     st.session_state.cart = []
 
-# Database initialization
-def init_db():
-    conn = sqlite3.connect('database/canteen.db')
-    c = conn.cursor()
-    
-    # Create users table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL
-        )
-    ''')
-    
-    # Create food_items table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS food_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            price REAL NOT NULL,
-            category TEXT NOT NULL,
-            stock INTEGER NOT NULL,
-            validity_type TEXT NOT NULL,
-            active BOOLEAN DEFAULT 1
-        )
-    ''')
-    
-    # Create orders table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS orders (
-            order_id TEXT PRIMARY KEY,
-            username TEXT NOT NULL,
-            items TEXT NOT NULL,
-            total_amount REAL NOT NULL,
-            payment_method TEXT NOT NULL,
-            payment_id TEXT,
-            status TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (username) REFERENCES users(username)
-        )
-    ''')
-    
-    # Insert default users if not exists
-    default_users = [
-        ('admin', 'admin123', 'admin'),
-        ('staff', 'staff123', 'staff'),
-        ('student1', 'stu123', 'student')
-    ]
-    
-    for user in default_users:
-        c.execute('INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)',
-                 user)
-    
-    conn.commit()
-    conn.close()
+# Shared database manager: one pooled instance per process, reused across reruns.
+# Constructing it runs pending schema migrations, so this happens once at startup.
+@st.cache_resource
+def get_db():
+    return DatabaseManager()
+
+# Background payment workers, shared by all sessions. Orders left pending by
+# a previous process are picked up again on startup.
+@st.cache_resource
+def get_payments():
+    payments = PaymentProcessor(get_db(), make_gateway())
+    payments.resume_pending()
+    return payments
+
+# Daily stock reset and order archival. Every process starts one; a lease in
+# the job_runs table makes sure each run happens on only one of them.
+@st.cache_resource
+def get_scheduler():
+    db = get_db()
+    return Scheduler(db, default_jobs(db)).start()
+
+@st.cache_data(ttl=TRENDS_TTL_SECONDS, show_spinner=False)
+def load_trends(bucket, start, end):
+    """Time series and peak hours for a period; every admin tab renders on
+    every rerun, so unrelated clicks reuse these instead of recomputing"""
+    db = get_db()
+    return db.get_time_series(bucket, start=start, end=end), db.get_peak_hours(start=start, end=end)
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def discard_export():
+    """Delete this session's prepared order export, if any"""
+    export_file = st.session_state.pop('export_file', None)
+    if export_file is not None and os.path.exists(export_file[0]):
+        os.remove(export_file[0])
 
 def login():
     st.title("🍽️ Smart Canteen System")
@@ -97,12 +109,7 @@ def login():
         role = st.selectbox("Role", ["Admin", "Staff", "Student"])
         
         if st.button("Login"):
-            conn = sqlite3.connect('database/canteen.db')
-            c = conn.cursor()
-            c.execute('SELECT * FROM users WHERE username=? AND password=? AND LOWER(role)=LOWER(?)',
-                     (username, password, role))
-            user = c.fetchone()
-            conn.close()
+            user = get_db().authenticate(username, password, role)
             
             if user:
                 st.session_state.authenticated = True
@@ -113,18 +120,40 @@ def login():
                 st.error("Invalid credentials!")
 
 def logout():
+    # Give back any stock still held for this user's cart
+    if st.session_state.cart:
+        get_db().release_holds(st.session_state.username)
     st.session_state.authenticated = False
     st.session_state.user_role = None
     st.session_state.username = None
     st.session_state.cart = []
+    st.session_state.pop('active_orders', None)
+    st.session_state.pop('active_orders_seq', None)
+    st.session_state.pop('prep_queue', None)
+    discard_export()
     st.rerun()
 
+def menu_page(db, key, available_only):
+    """Category/search filters, then the current page of matching menu items and the total"""
+    category, search = display_menu_filters(key, db.get_menu_categories(available_only))
+    if search and available_only:
+        # Students get the best full-text matches rather than a substring page
+        items = db.search_menu(search, limit=MENU_PAGE_SIZE, category=category)
+        return items, len(items)
+    items, total = db.get_menu_page(category, search, offset=get_page_offset(key),
+                                    limit=MENU_PAGE_SIZE, available_only=available_only)
+    if not items and get_page_offset(key) > 0:
+        # Items were removed since the page was chosen; start over
+        reset_offset(key)
+        st.rerun()
+    return items, total
+
 def student_dashboard():
     st.title("Student Dashboard")
     
     # Initialize database and payment managers
-    db = DatabaseManager()
-    #payment = PaymentManager()
+    db = get_db()
+    payments = get_payments()
     
     # Sidebar
     with st.sidebar:
@@ -138,25 +167,36 @@ def student_dashboard():
     with tab1:
         st.subheader("Available Menu")
         
-        # Display menu
-        menu_items = db.get_menu_items()
+        # Display one filtered page of the menu, so the widget count stays bounded
+        menu_items, menu_total = menu_page(db, "menu", available_only=True)
         
         def add_to_cart(item, quantity):
+            # Reserve the portions now so checkout cannot fail on them later
+            try:
+                hold_id = db.hold_stock(st.session_state.username, item.id, quantity)
+            except InsufficientStockError as e:
+                st.error(f"Only {e.shortfalls[0]['available']} x {item.name} left")
+                return
             cart_item = {
-                'id': item['id'],
-                'name': item['name'],
-                'price': item['price'],
-                'quantity': quantity
+                'id': item.id,
+                'name': item.name,
+                'price': item.price,
+                'quantity': quantity,
+                'hold_id': hold_id
             }
             st.session_state.cart.append(cart_item)
-            st.success(f"Added {quantity} x {item['name']} to cart")
+            held = f" (held for {HOLD_TTL_MINUTES} minutes)" if hold_id is not None else ""
+            st.success(f"Added {quantity} x {item.name} to cart{held}")
         
         display_menu(menu_items, add_to_cart)
+        display_offset_pager("menu", menu_total, MENU_PAGE_SIZE)
         
         # Display cart
         st.markdown("---")
         
         def remove_from_cart(item):
+            if item.get('hold_id') is not None:
+                db.release_hold(item['hold_id'])
             st.session_state.cart.remove(item)
         
         total = display_cart(st.session_state.cart, remove_from_cart)
@@ -168,123 +208,187 @@ def student_dashboard():
             )
             
             if st.button("Place Order"):
-                if payment_method == "Razorpay":
-                    payment_response = payment.process_payment(total)
-                    if payment_response['status'] == 'success':
-                        order_id = db.create_order(
+                try:
+                    if payment_method == "Razorpay":
+                        # Stock is held while the payment is captured in the background
+                        order_id = db.place_order(
                             st.session_state.username,
                             st.session_state.cart,
                             total,
                             'razorpay',
-                            payment_response['payment_id']
+                            status=PENDING_PAYMENT
+                        )
+                        payments.submit(order_id, total)
+                    else:
+                        order_id = db.place_order(
+                            st.session_state.username,
+                            st.session_state.cart,
+                            total,
+                            'cod'
                         )
+                except InsufficientStockError as e:
+                    st.error("Some items are no longer available in the requested quantity:")
+                    for shortfall in e.shortfalls:
+                        st.write(f"- {shortfall['name']}: requested {shortfall['requested']}, "
+                                 f"available {shortfall['available']}")
                 else:
-                    order_id = db.create_order(
-                        st.session_state.username,
-                        st.session_state.cart,
-                        total,
-                        'cod'
-                    )
-                
-                # Update stock
-                for item in st.session_state.cart:
-                    db.update_stock(item['id'], item['quantity'])
-                
-                st.session_state.cart = []
-                st.success(f"Order placed successfully! Order ID: {order_id}")
-                st.rerun()
+                    st.session_state.cart = []
+                    st.success(f"Order placed successfully! Order ID: {order_id}")
+                    st.rerun()
     
     with tab2:
         st.subheader("Active Orders")
-        active_orders = db.get_user_orders(st.session_state.username)
-        active_orders = active_orders[active_orders['status'] != 'prepared']
-        
-        if not active_orders.empty:
-            for _, order in active_orders.iterrows():
-                display_order_status(order['order_id'], order['status'])
-        else:
-            st.info("No active orders")
+        student_active_orders(db)
     
     with tab3:
         st.subheader("Order History")
-        orders = db.get_user_orders(st.session_state.username)
+        orders, next_cursor = db.get_orders_page(
+            username=st.session_state.username,
+            cursor=get_page_cursor("history"),
+            page_size=ORDERS_PAGE_SIZE
+        )
         display_order_history(orders)
+        display_pager("history", next_cursor)
 
-def staff_dashboard():
-    st.title("Staff Dashboard")
+@st.fragment(run_every=STUDENT_REFRESH_SECONDS)
+def student_active_orders(db):
+    # Pending payments are confirmed in the background; refresh to pick that up
+    orders = db.get_user_orders(st.session_state.username,
+                                status=(PENDING_PAYMENT, PAYMENT_FAILED) + ACTIVE_STATUSES)
+    # Failed payments stay listed for a while so the student sees what happened
+    cutoff = (datetime.now(timezone.utc) - timedelta(minutes=FAILED_PAYMENT_NOTICE_MINUTES)
+              ).strftime('%Y-%m-%d %H:%M:%S')
+    active_orders = [order for order in orders
+                     if order.status != PAYMENT_FAILED or order.timestamp >= cutoff]
     
-    # Initialize database manager
-    db = DatabaseManager()
-    
-    # Sidebar
-    with st.sidebar:
-        st.title(f"Welcome, {st.session_state.username}")
-        if st.button("Logout"):
-            logout()
+    if active_orders:
+        for order in active_orders:
+            display_order_status(order.order_id, order.status)
+    else:
+        st.info("No active orders")
+
+def sync_active_orders(db):
+    """Return the active orders, applying only order changes since the last sync"""
+    if 'active_orders_seq' not in st.session_state:
+        # Read the sequence first so nothing committed during the load is missed
+        st.session_state.active_orders_seq = db.get_order_change_seq()
+        orders = db.get_all_orders(status=ACTIVE_STATUSES)
+        st.session_state.active_orders = {order.order_id: order for order in orders}
+        st.session_state.prep_queue = None
     
-    # Main content
-    st.subheader("Incoming Orders")
+    active = st.session_state.active_orders
+    changes, st.session_state.active_orders_seq = db.get_order_changes(
+        st.session_state.active_orders_seq)
+    if changes:
+        # The kitchen prep list is only recomputed when orders actually change
+        st.session_state.prep_queue = None
+    for order in changes:
+        if order.status in ACTIVE_STATUSES:
+            active[order.order_id] = order
+        else:
+            active.pop(order.order_id, None)
     
+    return sorted(active.values(),
+                  key=lambda order: (order.timestamp, order.order_id),
+                  reverse=True)
+
+@st.fragment(run_every=STAFF_REFRESH_SECONDS)
+def incoming_orders(db):
     # Get all orders that are not completed
-    orders = db.get_all_orders()
-    active_orders = orders[orders['status'] != 'prepared']
+    active_orders = sync_active_orders(db)
     
-    if active_orders.empty:
+    # Batch list: how much of each item to make across all active orders
+    st.subheader("Kitchen Prep List")
+    if st.session_state.prep_queue is None:
+        st.session_state.prep_queue = db.get_prep_queue()
+    display_prep_queue(st.session_state.prep_queue)
+    
+    st.subheader("Incoming Orders")
+    
+    if not active_orders:
         st.info("No active orders")
     else:
-        for _, order in active_orders.iterrows():
-            with st.expander(f"Order #{order['order_id']} - {order['timestamp']}"):
-                st.write(f"**Customer:** {order['username']}")
-                st.write(f"**Payment:** {order['payment_method']}")
-                st.write(f"**Amount:** ₹{order['total_amount']:.2f}")
+        for order in active_orders:
+            with st.expander(f"Order #{order.order_id} - {order.timestamp}"):
+                st.write(f"**Customer:** {order.username}")
+                st.write(f"**Payment:** {order.payment_method}")
+                st.write(f"**Amount:** ₹{order.total_amount:.2f}")
                 
                 # Display items
-                items = pd.read_json(order['items'])
                 st.write("**Items:**")
-                for _, item in items.iterrows():
-                    st.write(f"- {item['quantity']}x {item['name']}")
+                st.markdown(format_order_items(order.items))
                 
                 # Status update buttons
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    if order['status'] != 'placed' and st.button('Mark as Placed', key=f"placed_{order['order_id']}"):
-                        db.update_order_status(order['order_id'], 'placed')
+                    if order.status != 'placed' and st.button('Mark as Placed', key=f"placed_{order.order_id}"):
+                        db.update_order_status(order.order_id, 'placed')
                         st.rerun()
                 
                 with col2:
-                    if order['status'] != 'preparing' and st.button('Mark as Preparing', key=f"preparing_{order['order_id']}"):
-                        db.update_order_status(order['order_id'], 'preparing')
+                    if order.status != 'preparing' and st.button('Mark as Preparing', key=f"preparing_{order.order_id}"):
+                        db.update_order_status(order.order_id, 'preparing')
                         st.rerun()
                 
                 with col3:
-                    if order['status'] != 'prepared' and st.button('Mark as Prepared', key=f"prepared_{order['order_id']}"):
-                        db.update_order_status(order['order_id'], 'prepared')
+                    if order.status != 'prepared' and st.button('Mark as Prepared', key=f"prepared_{order.order_id}"):
+                        db.update_order_status(order.order_id, 'prepared')
                         st.rerun()
+
+def staff_dashboard():
+    st.title("Staff Dashboard")
+    
+    # Initialize database manager
+    db = get_db()
+    
+    # Sidebar
+    with st.sidebar:
+        st.title(f"Welcome, {st.session_state.username}")
+        if st.button("Logout"):
+            logout()
+    
+    # Main content: incoming orders refresh on their own every few seconds
+    incoming_orders(db)
     
     # Completed orders
     st.markdown("---")
     st.subheader("Completed Orders")
-    completed_orders = orders[orders['status'] == 'prepared']
     
-    if completed_orders.empty:
+    # Date filter is applied in SQL; one page of results is loaded at a time
+    today = date.today()
+    date_range = st.date_input("Ordered between", value=(today - timedelta(days=7), today),
+                               on_change=reset_pages, args=("completed",))
+    start, end = None, None
+    if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+        start, end = date_range[0], date_range[1] + timedelta(days=1)
+    
+    completed_orders, next_cursor = db.get_orders_page(
+        status='prepared',
+        start=start,
+        end=end,
+        cursor=get_page_cursor("completed"),
+        page_size=ORDERS_PAGE_SIZE
+    )
+    
+    if not completed_orders:
         st.info("No completed orders")
     else:
-        for _, order in completed_orders.iterrows():
-            with st.expander(f"Order #{order['order_id']} - {order['timestamp']}"):
-                st.write(f"**Customer:** {order['username']}")
-                st.write(f"**Payment:** {order['payment_method']}")
-                st.write(f"**Amount:** ₹{order['total_amount']:.2f}")
-                items = pd.read_json(order['items'])
+        for order in completed_orders:
+            with st.expander(f"Order #{order.order_id} - {order.timestamp}"):
+                st.write(f"**Customer:** {order.username}")
+                st.write(f"**Payment:** {order.payment_method}")
+                st.write(f"**Amount:** ₹{order.total_amount:.2f}")
                 st.write("**Items:**")
-                for _, item in items.iterrows():
-                    st.write(f"- {item['quantity']}x {item['name']}")
+                st.markdown(format_order_items(order.items))
+    
+    display_pager("completed", next_cursor)
 
 def admin_dashboard():
     st.title("Admin Dashboard")
     
     # Initialize database manager
-    db = DatabaseManager()
+    db = get_db()
     
     # Sidebar
     with st.sidebar:
@@ -293,7 +397,7 @@ def admin_dashboard():
             logout()
     
     # Main content tabs
-    tabs = st.tabs(["User Management", "Food Items", "Analytics"])
+    tabs = st.tabs(["User Management", "Food Items", "Analytics", "Performance"])
     
     with tabs[0]:
         st.subheader("User Management")
@@ -305,49 +409,32 @@ def admin_dashboard():
             new_role = st.selectbox("Role", ["admin", "staff", "student"])
             
             if st.button("Add User"):
-                conn = sqlite3.connect('database/canteen.db')
-                c = conn.cursor()
                 try:
-                    c.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)',
-                            (new_username, new_password, new_role))
-                    conn.commit()
+                    db.add_user(new_username, new_password, new_role)
                     st.success("User added successfully!")
                 except sqlite3.IntegrityError:
                     st.error("Username already exists!")
-                conn.close()
                 st.rerun()
         
         # List and manage users
-        conn = sqlite3.connect('database/canteen.db')
-        users = pd.read_sql_query('SELECT * FROM users', conn)
-        conn.close()
+        users = db.get_users()
         
         st.write("### Current Users")
-        for _, user in users.iterrows():
+        for user in users:
             col1, col2, col3 = st.columns([2, 1, 1])
             
             with col1:
-                st.write(f"**{user['username']}** ({user['role']})")
+                st.write(f"**{user.username}** ({user.role})")
             
             with col2:
-                if st.button("Reset Password", key=f"reset_{user['username']}"):
-                    conn = sqlite3.connect('database/canteen.db')
-                    c = conn.cursor()
-                    c.execute('UPDATE users SET password = ? WHERE username = ?',
-                            ('password123', user['username']))
-                    conn.commit()
-                    conn.close()
-                    st.success(f"Password reset for {user['username']}")
+                if st.button("Reset Password", key=f"reset_{user.username}"):
+                    db.reset_password(user.username)
+                    st.success(f"Password reset for {user.username}")
             
             with col3:
-                if user['username'] not in ['admin', 'staff', 'student1']:
-                    if st.button("Delete", key=f"delete_{user['username']}"):
-                        conn = sqlite3.connect('database/canteen.db')
-                        c = conn.cursor()
-                        c.execute('DELETE FROM users WHERE username = ?',
-                                (user['username'],))
-                        conn.commit()
-                        conn.close()
+                if user.username not in ['admin', 'staff', 'student1']:
+                    if st.button("Delete", key=f"delete_{user.username}"):
+                        db.delete_user(user.username)
                         st.rerun()
     
     with tabs[1]:
@@ -357,7 +444,7 @@ def admin_dashboard():
         with st.expander("Add New Food Item"):
             name = st.text_input("Item Name")
             price = st.number_input("Price (₹)", min_value=0.0, step=0.5)
-            category = st.selectbox("Category", ["Breakfast", "Lunch", "Snacks", "Beverages"])
+            category = st.selectbox("Category", CATEGORIES)
             stock = st.number_input("Initial Stock", min_value=0)
             validity_type = st.selectbox("Validity Type", ["daily", "regular"])
             
@@ -366,43 +453,72 @@ def admin_dashboard():
                 st.success("Item added successfully!")
                 st.rerun()
         
-        # List and manage food items
-        menu_items = db.get_menu_items()
+        # Bulk import/export: one transaction for the whole file
+        with st.expander("Bulk Import / Export Menu"):
+            upload = st.file_uploader("Menu file (CSV or JSON)", type=["csv", "json"])
+            st.caption(f"Columns: {', '.join(MENU_COLUMNS)}. Existing items are matched by name.")
+            
+            if upload is not None and st.button("Import Menu"):
+                fmt = 'json' if upload.name.lower().endswith('.json') else 'csv'
+                try:
+                    rows = parse_menu_file(upload.getvalue(), fmt)
+                except ValueError as e:
+                    st.error(f"Could not read {upload.name}: {e}")
+                else:
+                    result = db.import_menu(rows)
+                    st.success(f"Imported {result['inserted']} new and updated "
+                               f"{result['updated']} existing items")
+                    if result['errors']:
+                        st.warning(f"{len(result['errors'])} rows were skipped:")
+                        st.dataframe(pd.DataFrame(result['errors']), hide_index=True)
+            
+            export_format = st.selectbox("Export format", ["csv", "json"], key="menu_export_format")
+            st.download_button(
+                "Export Menu",
+                data=functools.partial(db.export_menu, export_format),
+                file_name=f"menu.{export_format}",
+                mime="text/csv" if export_format == "csv" else "application/json"
+            )
         
+        # List and manage food items, one filtered page at a time
         st.write("### Current Menu Items")
-        for _, item in menu_items.iterrows():
-            with st.expander(f"{item['name']} ({item['category']})"):
+        menu_items, menu_total = menu_page(db, "admin_menu", available_only=False)
+        
+        for item in menu_items:
+            with st.expander(f"{item.name} ({item.category})"):
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    st.write(f"**Price:** ₹{item['price']:.2f}")
-                    st.write(f"**Stock:** {item['stock']}")
-                    st.write(f"**Type:** {item['validity_type']}")
+                    st.write(f"**Price:** ₹{item.price:.2f}")
+                    st.write(f"**Stock:** {item.stock}")
+                    st.write(f"**Type:** {item.validity_type}")
                 
                 with col2:
                     new_stock = st.number_input("Update Stock",
                                               min_value=0,
-                                              value=item['stock'],
-                                              key=f"stock_{item['id']}")
+                                              value=item.stock,
+                                              key=f"stock_{item.id}")
                     
-                    if st.button("Update Stock", key=f"update_{item['id']}"):
+                    if st.button("Update Stock", key=f"update_{item.id}"):
                         db.update_food_item(
-                            item['id'],
-                            item['name'],
-                            item['price'],
-                            item['category'],
+                            item.id,
+                            item.name,
+                            item.price,
+                            item.category,
                             new_stock,
-                            item['validity_type']
+                            item.validity_type
                         )
                         st.success("Stock updated!")
                         st.rerun()
                     
-                    if st.button("Delete Item", key=f"delete_item_{item['id']}"):
-                        db.delete_food_item(item['id'])
+                    if st.button("Delete Item", key=f"delete_item_{item.id}"):
+                        db.delete_food_item(item.id)
                         st.success("Item deleted!")
                         st.rerun()
         
-        # Reset daily items
+        display_offset_pager("admin_menu", menu_total, MENU_PAGE_SIZE)
+        
+        # Reset daily items (also done automatically every day, see Performance tab)
         st.markdown("---")
         if st.button("Reset Daily Items"):
             db.reset_daily_items()
@@ -426,33 +542,208 @@ def admin_dashboard():
                 st.bar_chart(payment_stats.set_index('payment_method'))
         
         with col2:
+            st.metric("Total Revenue", f"₹{analytics['total_revenue']:.2f}")
+            
             st.write("### Most Sold Items")
             most_sold = analytics['most_sold']
             if not most_sold.empty:
-                st.bar_chart(most_sold.set_index('items'))
+                st.bar_chart(most_sold.set_index('name')['quantity'])
+            
+            st.write("### Orders by Status")
+            status_stats = analytics['status_stats']
+            if not status_stats.empty:
+                st.bar_chart(status_stats.set_index('status'))
+        
+        # Revenue and throughput over time
+        st.markdown("---")
+        st.write("### Trends")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            bucket = st.selectbox("Bucket", ["hour", "day", "week"], index=1)
+        
+        with col2:
+            today = date.today()
+            trend_range = st.date_input("Period", value=(today - timedelta(days=30), today),
+                                        key="trend_range")
+        
+        start, end = None, None
+        if isinstance(trend_range, (list, tuple)) and len(trend_range) == 2:
+            start, end = trend_range[0], trend_range[1] + timedelta(days=1)
+        
+        series, peaks = load_trends(bucket, start, end)
+        if series.empty:
+            st.info("No orders in this period")
+        else:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.write("**Revenue (₹)**")
+                st.line_chart(series['revenue'])
+                st.write("**Average basket size (items)**")
+                st.line_chart(series['avg_basket_size'])
+            
+            with col2:
+                st.write("**Orders**")
+                st.line_chart(series['orders'])
+                st.write("**Average order-to-prepared time (min)**")
+                st.line_chart(series['avg_prep_minutes'])
+            
+            if peaks['peak_hour'] is not None:
+                st.metric("Peak Hour (UTC)",
+                          f"{peaks['peak_hour']:02d}:00 - {peaks['peak_hour'] + 1:02d}:00")
+                st.bar_chart(peaks['profile']['avg_orders_per_day'])
+        
+        # Export data: streamed to a temp file in chunks, then offered for download
+        st.markdown("---")
+        st.write("### Export Orders")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            export_format = st.selectbox("Format", ["csv", "parquet"])
+        
+        with col2:
+            export_range = st.date_input("Orders placed between", value=(), key="export_range")
+        
+        if st.button("Prepare Export"):
+            start, end = None, None
+            if isinstance(export_range, (list, tuple)) and len(export_range) == 2:
+                start, end = export_range[0], export_range[1] + timedelta(days=1)
+            
+            fd, path = tempfile.mkstemp(prefix="orders_export_", suffix=f".{export_format}")
+            os.close(fd)
+            try:
+                rows = db.export_orders(path, export_format, start=start, end=end)
+            except RuntimeError as e:
+                os.remove(path)
+                st.error(str(e))
+            else:
+                discard_export()
+                st.session_state.export_file = (path, export_format, rows)
+        
+        if 'export_file' in st.session_state:
+            path, export_format, rows = st.session_state.export_file
+            if os.path.exists(path):
+                # The file is only read when the button is clicked, not on every rerun
+                st.download_button(
+                    f"Download {rows} orders ({export_format.upper()})",
+                    data=functools.partial(read_file, path),
+                    file_name=f"orders_export.{export_format}",
+                    mime="text/csv" if export_format == "csv" else "application/octet-stream"
+                )
         
-        # Export data
-        if st.button("Export Orders CSV"):
-            orders = db.get_all_orders()
-            orders.to_csv('orders_export.csv', index=False)
-            st.success("Orders exported to orders_export.csv")
+        # Payment reconciliation: gateway settlements vs. orders for one day (UTC)
+        st.markdown("---")
+        st.write("### Payment Reconciliation")
+        reconcile_day = st.date_input("Settlement day", value=date.today(), key="reconcile_day")
+        
+        if st.button("Reconcile Payments"):
+            report = reconcile(db, get_payments().gateway,
+                               reconcile_day, reconcile_day + timedelta(days=1))
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Settlements", report['settlements'])
+            with col2:
+                st.metric("Paid Orders", report['paid_orders'])
+            with col3:
+                st.metric("Matched", report['matched'])
+            
+            problems = [
+                ("Settlements without an order", 'unmatched_settlements'),
+                ("Paid orders without a settlement", 'missing_settlements'),
+                ("Duplicate settlements", 'duplicate_settlements'),
+                ("Payment IDs on several orders", 'duplicate_orders'),
+                ("Amount mismatches", 'amount_mismatches'),
+            ]
+            if not any(len(report[key]) for _, key in problems):
+                st.success("All settlements match their orders")
+            for label, key in problems:
+                if len(report[key]):
+                    st.warning(f"{label}: {len(report[key])}")
+                    st.dataframe(report[key])
+    
+    with tabs[3]:
+        st.subheader("Database Performance")
+        
+        stats = db.performance_stats()
+        reruns = stats['reruns']
+        menu_cache = stats['menu_cache']
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Script Runs", reruns['reruns'])
+        with col2:
+            st.metric("Statements / Run (mean)", reruns['mean_statements'])
+        with col3:
+            st.metric("Statements / Run (p99)", reruns['p99_statements'])
+        with col4:
+            st.metric("Menu Cache Hits", f"{menu_cache['hits']} / {menu_cache['hits'] + menu_cache['misses']}")
+        
+        write_queue = stats['write_queue']
+        if write_queue is not None:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Write Batches", write_queue['batches'])
+            with col2:
+                st.metric("Writes / Batch (mean)", write_queue['mean_batch'])
+            with col3:
+                st.metric("Largest Batch", write_queue['largest_batch'])
+            with col4:
+                st.metric("Failed Batches", write_queue['failed_batches'])
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("### Top Queries by Total Time")
+            st.dataframe(pd.DataFrame(STATS.top('queries', by='total_ms')), hide_index=True)
+        with col2:
+            st.write("### Top Queries by p99")
+            st.dataframe(pd.DataFrame(STATS.top('queries', by='p99_ms')), hide_index=True)
+        
+        st.write("### DatabaseManager Methods")
+        st.dataframe(pd.DataFrame(STATS.top('methods', by='total_ms', limit=None)), hide_index=True)
+        
+        st.write("### Slow Queries")
+        threshold = st.number_input("Slow query threshold (ms)", min_value=0.0,
+                                    value=float(STATS.slow_threshold_ms), step=10.0)
+        if threshold != STATS.slow_threshold_ms:
+            STATS.slow_threshold_ms = threshold
+        if stats['slow_queries']:
+            st.dataframe(pd.DataFrame(stats['slow_queries']), hide_index=True)
+        else:
+            st.info("No slow queries recorded")
+        
+        # Full dump for offline analysis
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Download Stats JSON", data=json.dumps(stats, indent=2, default=str),
+                               file_name="db_stats.json", mime="application/json")
+        with col2:
+            if st.button("Reset Stats"):
+                STATS.reset()
+                st.rerun()
+        
+        st.write("### Scheduled Jobs")
+        st.dataframe(db.get_job_runs(), hide_index=True)
 
 def main():
-    # Initialize database
-    if not os.path.exists('database'):
-        os.makedirs('database')
-    init_db()
+    # Initialize database (migrations run once per process) and background jobs;
+    # payment workers start here so orders stranded by a crash resume at once
+    db = get_db()
+    get_scheduler()
+    get_payments()
     
-    # Main application logic
-    if not st.session_state.authenticated:
-        login()
-    else:
-        if st.session_state.user_role == 'student':
-            student_dashboard()
-        elif st.session_state.user_role == 'staff':
-            staff_dashboard()
-        elif st.session_state.user_role == 'admin':
-            admin_dashboard()
+    # Main application logic; identical reads within this rerun hit the DB once
+    with db.request_scope():
+        if not st.session_state.authenticated:
+            login()
+        else:
+            if st.session_state.user_role == 'student':
+                student_dashboard()
+            elif st.session_state.user_role == 'staff':
+                staff_dashboard()
+            elif st.session_state.user_role == 'admin':
+                admin_dashboard()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,100 @@
+"""Check that streaming order export keeps peak memory flat as the table grows.
+
+Usage: python -m benchmarks.bench_export [--orders 20000] [--factor 10] [--tolerance 1.5]
+
+A temporary database is seeded with --orders orders and exported to CSV
+and Parquet, then grown to --orders x --factor and exported again. The
+report shows time and peak traced memory per export; the run exits with
+status 1 if any format's peak at the larger size exceeds --tolerance times
+its peak at the smaller size.
+
+--orders must be at least twice the export chunk size (export.CHUNK_SIZE):
+below that the smaller run never holds a full chunk, and its peak
+understates the steady state the check compares against.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from database import export
+from database.db_utils import DatabaseManager
+
+FORMATS = ['csv', 'parquet']
+
+ITEMS = json.dumps([{'id': 1, 'name': 'Masala Dosa', 'price': 40.0, 'quantity': 2},
+                    {'id': 7, 'name': 'Filter Coffee', 'price': 15.0, 'quantity': 1}])
+
+
+def seed(db, start, stop):
+    """Insert orders numbered start..stop-1 in one statement"""
+    with db.transaction() as conn:
+        conn.execute('''
+            WITH RECURSIVE n(i) AS (SELECT ? UNION ALL SELECT i + 1 FROM n WHERE i + 1 < ?)
+            INSERT INTO orders (order_id, username, items, total_amount, payment_method,
+                                status, timestamp)
+            SELECT printf('BENCH-%09d', i), 'bench' || (i % 500), ?, 95.0, 'cod', 'prepared',
+                   datetime('2026-01-01', printf('+%d seconds', i * 7))
+            FROM n
+        ''', (start, stop, ITEMS))
+
+
+def measure(db, path, fmt):
+    """(rows, seconds, peak traced MiB) for one export"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = db.export_orders(path, fmt)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rows, elapsed, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--factor', type=int, default=10)
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='largest allowed ratio of peak memory between the two sizes')
+    args = parser.parse_args()
+    if args.orders < 2 * export.CHUNK_SIZE:
+        parser.error(f"--orders must be at least {2 * export.CHUNK_SIZE} "
+                     f"(twice the export chunk size)")
+
+    workdir = tempfile.mkdtemp(prefix='canteen_bench_')
+    results = {}
+    try:
+        db = DatabaseManager(os.path.join(workdir, 'canteen.db'))
+        seeded = 0
+        for size in (args.orders, args.orders * args.factor):
+            seed(db, seeded, size)
+            seeded = size
+            for fmt in FORMATS:
+                path = os.path.join(workdir, f'orders.{fmt}')
+                rows, elapsed, peak = measure(db, path, fmt)
+                assert rows == size, (rows, size)
+                results[fmt, size] = (elapsed, peak)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    failed = False
+    small, large = args.orders, args.orders * args.factor
+    print(f"{'format':<9}{'orders':>10}{'seconds':>10}{'peak MiB':>10}")
+    for fmt in FORMATS:
+        for size in (small, large):
+            elapsed, peak = results[fmt, size]
+            print(f"{fmt:<9}{size:>10}{elapsed:>10.2f}{peak:>10.2f}")
+        ratio = results[fmt, large][1] / results[fmt, small][1]
+        ok = ratio <= args.tolerance
+        failed |= not ok
+        print(f"{fmt}: peak grew {ratio:.2f}x for {args.factor}x the rows "
+              f"({'ok' if ok else f'FAIL, limit {args.tolerance}x'})")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
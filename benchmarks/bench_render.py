@@ -0,0 +1,92 @@
+"""Benchmark rendering order item lists: per-order pd.read_json vs decoded Order rows.
+
+Usage: python -m benchmarks.bench_render [--orders 1000] [--repeat 5]
+
+A temporary database is seeded with one student's order history. The
+"before" path reads it into a DataFrame and parses each order's items
+with pd.read_json; the "after" path is the app's own, get_user_orders()
+(Order rows with items decoded once per query) rendered with
+format_order_items(). Streamlit calls are left out; both paths produce
+the same item text.
+"""
+import argparse
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from components.ui import format_order_items
+from database.db_utils import DatabaseManager
+
+USERNAME = 'bench'
+
+
+def seed(db, count, seed=42):
+    rng = random.Random(seed)
+    with db.transaction() as conn:
+        for _ in range(count):
+            lines = [
+                {'id': rng.randint(1, 50), 'name': f'Item {rng.randint(1, 50)}',
+                 'price': rng.choice([10.0, 15.0, 30.0, 45.0]), 'quantity': rng.randint(1, 3)}
+                for _ in range(rng.randint(1, 5))
+            ]
+            total = sum(line['price'] * line['quantity'] for line in lines)
+            db._insert_order(conn, USERNAME, lines, total, 'cod', None)
+
+
+def render_before(db):
+    # Previous UI path: one DataFrame per order, walked with iterrows()
+    with db.connection() as conn:
+        orders = pd.read_sql_query(
+            'SELECT * FROM orders WHERE username = ? ORDER BY timestamp DESC, order_id DESC',
+            conn, params=(USERNAME,))
+    rendered = []
+    for _, order in orders.iterrows():
+        items = pd.read_json(io.StringIO(order['items']))
+        rendered.append('\n'.join(f"- {item['quantity']}x {item['name']}"
+                                  for _, item in items.iterrows()))
+    return rendered
+
+
+def render_after(db):
+    # Current UI path: decoded Order rows, rendered from plain lists
+    return [format_order_items(order.items) for order in db.get_user_orders(USERNAME)]
+
+
+def best_of(func, db, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(db)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='canteen_bench_')
+    try:
+        db = DatabaseManager(os.path.join(workdir, 'canteen.db'))
+        seed(db, args.orders)
+        assert render_before(db) == render_after(db)
+        before = best_of(render_before, db, args.repeat)
+        after = best_of(render_after, db, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"orders: {args.orders}")
+    print(f"before (pd.read_json per order): {before * 1000:.1f} ms")
+    print(f"after  (Order rows, lists):      {after * 1000:.1f} ms")
+    print(f"speedup: {before / after:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
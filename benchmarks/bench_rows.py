@@ -0,0 +1,117 @@
+"""Benchmark one rerun's reads and rendering: DataFrames + iterrows() vs row objects.
+
+Usage: python -m benchmarks.bench_rows [--items 500] [--orders 5000] [--repeat 5]
+
+A temporary database is seeded with the menu and one student's order
+history. Each "rerun" reads both and formats every row the way the UI
+does (Streamlit calls left out); the report shows best-of time and peak
+traced memory for each representation.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from components.ui import format_order_items
+from database.db_utils import DatabaseManager, _loads, read_orders
+from database.rows import MenuItem, Order
+
+MENU_WHERE = "WHERE active = 1 AND (stock > 0 OR validity_type = 'daily')"
+ORDERS_WHERE = "WHERE username = 'bench' ORDER BY timestamp DESC, order_id DESC"
+
+
+def decode_items(orders):
+    """Replace the JSON items column of an orders DataFrame with Python lists"""
+    orders['items'] = pd.Series([_loads(items) for items in orders['items']],
+                                index=orders.index, dtype=object)
+    return orders
+
+
+def seed(db, items, orders, seed=42):
+    rng = random.Random(seed)
+    db.import_menu([
+        {'name': f'Bench item {i}', 'price': rng.choice([10, 15, 30, 45]),
+         'category': rng.choice(['Breakfast', 'Lunch', 'Snacks', 'Beverages']),
+         'stock': rng.randint(1, 100), 'validity_type': 'regular'}
+        for i in range(items)
+    ])
+    menu = db.get_menu_items()
+    with db.transaction() as conn:
+        for _ in range(orders):
+            lines = [{'id': item.id, 'name': item.name, 'price': item.price,
+                      'quantity': rng.randint(1, 3)}
+                     for item in rng.sample(menu, k=rng.randint(1, 4))]
+            total = sum(line['price'] * line['quantity'] for line in lines)
+            db._insert_order(conn, 'bench', lines, total, 'cod', None)
+
+
+def rerun_dataframes(conn):
+    # Previous read path: SELECT * into DataFrames, walked with iterrows()
+    menu = pd.read_sql_query(f'SELECT * FROM food_items {MENU_WHERE}', conn)
+    orders = decode_items(pd.read_sql_query(f'SELECT * FROM orders {ORDERS_WHERE}', conn))
+    lines = [f"{item['name']} ({item['category']}) ₹{item['price']:.2f} {item['stock']}"
+             for _, item in menu.iterrows()]
+    lines += [f"{order['order_id']} {order['status']} ₹{order['total_amount']:.2f}\n"
+              f"{format_order_items(order['items'], with_prices=True)}"
+              for _, order in orders.iterrows()]
+    return lines
+
+
+def rerun_rows(conn):
+    # Current read path: __slots__ rows built from cursor tuples
+    menu = [MenuItem(*row) for row in
+            conn.execute(f'SELECT {MenuItem.columns()} FROM food_items {MENU_WHERE}')]
+    orders = read_orders(conn.execute(f'SELECT {Order.columns()} FROM orders {ORDERS_WHERE}'))
+    lines = [f"{item.name} ({item.category}) ₹{item.price:.2f} {item.stock}" for item in menu]
+    lines += [f"{order.order_id} {order.status} ₹{order.total_amount:.2f}\n"
+              f"{format_order_items(order.items, with_prices=True)}"
+              for order in orders]
+    return lines
+
+
+def measure(func, conn, repeat):
+    """Best-of wall time and peak traced memory (MiB) for one rerun"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(conn)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(conn)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='canteen_bench_')
+    try:
+        db = DatabaseManager(os.path.join(workdir, 'canteen.db'))
+        seed(db, args.items, args.orders)
+        with db.connection() as conn:
+            assert rerun_dataframes(conn) == rerun_rows(conn)
+            before = measure(rerun_dataframes, conn, args.repeat)
+            after = measure(rerun_rows, conn, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"menu items: {args.items}, orders: {args.orders}")
+    print(f"before (DataFrames, iterrows): {before[0] * 1000:7.1f} ms, peak {before[1]:6.1f} MiB")
+    print(f"after  (row objects):          {after[0] * 1000:7.1f} ms, peak {after[1]:6.1f} MiB")
+    print(f"speedup: {before[0] / after[0]:.1f}x, memory: {before[1] / after[1]:.1f}x less")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark menu search on a large catalog: substring scan vs FTS5.
+
+Usage: python -m benchmarks.bench_search [--items 10000] [--repeat 20]
+
+A temporary database is seeded with generated item names; each query is
+run through DatabaseManager.get_menu_page(search=...) (substring filter over
+the cached menu) and
+DatabaseManager.search_menu() (FTS5 prefix match, bm25 ranking).
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from database.db_utils import DatabaseManager
+
+WORDS = ['paneer', 'masala', 'dosa', 'butter', 'chicken', 'veg', 'biryani', 'tikka',
+         'idli', 'vada', 'coffee', 'tea', 'samosa', 'roll', 'fried', 'rice', 'noodles',
+         'paratha', 'aloo', 'gobi', 'lassi', 'juice', 'sandwich', 'puff', 'curd']
+CATEGORIES = ['Breakfast', 'Lunch', 'Snacks', 'Beverages']
+QUERIES = ['paneer', 'pan', 'masala dosa', 'chick tik', 'coffee', 'veg roll', 'lassi']
+
+
+def seed(db, items, seed=7):
+    rng = random.Random(seed)
+    db.import_menu([
+        {'name': f"{' '.join(rng.sample(WORDS, k=rng.randint(2, 3))).title()} {i}",
+         'price': rng.choice([10, 20, 40, 60]), 'category': rng.choice(CATEGORIES),
+         'stock': rng.randint(0, 50), 'validity_type': 'regular'}
+        for i in range(items)
+    ])
+
+
+def time_queries(search, repeat):
+    """Mean milliseconds per call for each query"""
+    timings = {}
+    for query in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            search(query)
+            samples.append(time.perf_counter() - start)
+        timings[query] = statistics.mean(samples) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=15)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='canteen_bench_')
+    try:
+        db = DatabaseManager(os.path.join(workdir, 'canteen.db'))
+        seed(db, args.items)
+        scan = time_queries(lambda q: db.get_menu_page(search=q, limit=args.limit), args.repeat)
+        fts = time_queries(lambda q: db.search_menu(q, limit=args.limit), args.repeat)
+        hits = {q: len(db.search_menu(q, limit=args.items)) for q in QUERIES}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"catalog: {args.items} items, {args.repeat} runs per query")
+    print(f"{'query':<14}{'FTS hits':>9}{'scan ms':>10}{'FTS ms':>9}")
+    for query in QUERIES:
+        print(f"{query:<14}{hits[query]:>9}{scan[query]:>10.2f}{fts[query]:>9.2f}")
+    print(f"mean: scan {statistics.mean(scan.values()):.2f} ms, "
+          f"FTS {statistics.mean(fts.values()):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
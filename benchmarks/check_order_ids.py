@@ -0,0 +1,98 @@
+"""Check that order IDs stay unique and ordered under concurrent checkouts.
+
+Usage: python -m benchmarks.check_order_ids [--threads 16] [--workers 4] [--orders 200]
+
+A temporary database is seeded with one benchmark item. --workers spawned
+processes, each running --threads threads, then place --orders orders per
+thread through DatabaseManager.place_order(). The run exits with status 1
+if any two orders got the same ID, if the number of stored orders differs
+from the number placed, or if sorting by order ID and sorting by commit
+order (change_seq) disagree.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from database.db_utils import DatabaseManager
+
+
+def place_orders(db_path, item, username, orders):
+    db = DatabaseManager(db_path)
+    item_id, name, price = item
+    cart = [{'id': item_id, 'name': name, 'price': price, 'quantity': 1}]
+    return [db.place_order(username, cart, price, 'cod') for _ in range(orders)]
+
+
+def run_worker(db_path, item, worker, threads, orders):
+    """One process: `threads` students ordering at once; returns their order IDs"""
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(place_orders, db_path, item, f'idcheck{worker}-{t}', orders)
+                   for t in range(threads)]
+        return [order_id for future in futures for order_id in future.result()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16, help='threads per process')
+    parser.add_argument('--workers', type=int, default=4, help='processes')
+    parser.add_argument('--orders', type=int, default=200, help='orders per thread')
+    parser.add_argument('--write-queue', action='store_true',
+                        help='route writes through the single-writer queue (CANTEEN_WRITE_QUEUE=1)')
+    args = parser.parse_args()
+    if args.write_queue:
+        os.environ['CANTEEN_WRITE_QUEUE'] = '1'
+
+    workdir = tempfile.mkdtemp(prefix='canteen_bench_')
+    try:
+        db_path = os.path.join(workdir, 'canteen.db')
+        db = DatabaseManager(db_path)
+        expected = args.workers * args.threads * args.orders
+        db.import_menu([{'name': 'ID check item', 'price': 10, 'category': 'Snacks',
+                         'stock': expected, 'validity_type': 'regular'}])
+        with db.connection() as conn:
+            item = tuple(conn.execute(
+                "SELECT id, name, price FROM food_items WHERE name = 'ID check item'").fetchone())
+
+        # Spawned, not forked: each worker opens its own connections
+        context = multiprocessing.get_context('spawn')
+        start = time.perf_counter()
+        with context.Pool(args.workers) as pool:
+            parts = pool.starmap(run_worker, [
+                (db_path, item, worker, args.threads, args.orders)
+                for worker in range(args.workers)
+            ])
+        elapsed = time.perf_counter() - start
+        placed = [order_id for part in parts for order_id in part]
+
+        with db.connection() as conn:
+            stored = [row[0] for row in conn.execute(
+                "SELECT order_id FROM orders WHERE username LIKE 'idcheck%' ORDER BY change_seq")]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    problems = []
+    duplicates = len(placed) - len(set(placed))
+    if duplicates:
+        problems.append(f"{duplicates} duplicate order IDs")
+    if len(stored) != expected:
+        problems.append(f"{len(stored)} orders stored, {expected} placed")
+    if stored != sorted(stored):
+        problems.append("order IDs do not sort in commit order")
+
+    print(f"orders: {len(placed)} from {args.workers} processes x {args.threads} threads "
+          f"in {elapsed:.2f} s")
+    print(f"IDs: {stored[0]} .. {stored[-1]}" if stored else "IDs: none")
+    if problems:
+        print("FAIL: " + "; ".join(problems))
+    else:
+        print("ok: all IDs unique and in commit order")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
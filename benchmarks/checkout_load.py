@@ -0,0 +1,220 @@
+"""Concurrent checkout load test against a temporary copy of the database.
+
+Simulates N students placing orders through DatabaseManager.place_order()
+(the checkout path used by student_dashboard()) from threads or processes
+and reports throughput, latency percentiles, lock errors, duplicate order
+IDs and final stock versus expected stock.
+
+Usage:
+    python -m benchmarks.checkout_load --students 50 --orders 20 --mode thread
+    python -m benchmarks.checkout_load --mode process --workers 4 --json result.json
+    python -m benchmarks.checkout_load --students 50 --orders 20 --write-queue
+
+The source database is never modified.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from database.db_utils import DatabaseManager, InsufficientStockError
+
+
+def prepare_database(source, workdir, items, stock):
+    """Copy source into workdir and seed benchmark items; returns (path, item rows)"""
+    path = os.path.join(workdir, 'canteen.db')
+    if os.path.exists(source):
+        # The backup API gives a consistent copy even while the app is running
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(path)
+        src.backup(dst)
+        src.close()
+        dst.close()
+
+    db = DatabaseManager(path)
+    db.import_menu([
+        {'name': f'Bench item {i}', 'price': 10 + i % 5 * 5, 'category': 'Lunch',
+         'stock': stock, 'validity_type': 'regular'}
+        for i in range(items)
+    ])
+    with db.connection() as conn:
+        rows = conn.execute('''
+            SELECT id, name, price, stock FROM food_items
+            WHERE name LIKE 'Bench item %' AND active = 1
+        ''').fetchall()
+    return path, rows
+
+
+def run_student(db_path, username, menu, orders, seed):
+    """Place orders for one simulated student; returns a list of result dicts"""
+    db = DatabaseManager(db_path)
+    rng = random.Random(seed)
+    results = []
+    for _ in range(orders):
+        lines = rng.sample(menu, k=min(len(menu), rng.randint(1, 3)))
+        cart = [{'id': item_id, 'name': name, 'price': price, 'quantity': rng.randint(1, 2)}
+                for item_id, name, price, _ in lines]
+        total = sum(line['price'] * line['quantity'] for line in cart)
+
+        start = time.perf_counter()
+        outcome, order_id = 'ok', None
+        try:
+            order_id = db.place_order(username, cart, total, 'cod')
+        except InsufficientStockError:
+            outcome = 'out_of_stock'
+        except sqlite3.OperationalError as e:
+            outcome = 'locked' if 'locked' in str(e) or 'busy' in str(e) else 'error'
+        except sqlite3.Error:
+            outcome = 'error'
+        results.append({
+            'latency': time.perf_counter() - start,
+            'outcome': outcome,
+            'order_id': order_id,
+            'cart': [(line['id'], line['quantity']) for line in cart] if outcome == 'ok' else []
+        })
+    return results
+
+
+def _run_threads(db_path, menu, args):
+    """Returns (results, elapsed seconds)"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.students) as pool:
+        futures = [pool.submit(run_student, db_path, f'bench{i}', menu, args.orders, args.seed + i)
+                   for i in range(args.students)]
+        results = [r for future in futures for r in future.result()]
+    return results, time.perf_counter() - start
+
+
+def _run_student_threads(db_path, menu, students, orders, seed):
+    # One process: its share of the students, each on its own thread
+    with ThreadPoolExecutor(max_workers=len(students)) as pool:
+        futures = [pool.submit(run_student, db_path, f'bench{i}', menu, orders, seed + i)
+                   for i in students]
+        return [r for future in futures for r in future.result()]
+
+
+def _worker_ready(barrier):
+    barrier.wait()
+
+
+def _run_processes(db_path, menu, args):
+    """Returns (results, elapsed seconds), timed from when every worker is up"""
+    shares = [list(range(args.students))[w::args.workers] for w in range(args.workers)]
+    # Spawned, not forked: workers must open their own SQLite connections
+    # rather than inherit the ones prepare_database() opened in this process
+    context = multiprocessing.get_context('spawn')
+    ready = context.Barrier(args.workers + 1)
+    with context.Pool(args.workers, initializer=_worker_ready, initargs=(ready,)) as pool:
+        # Interpreter start-up and imports are not part of the measurement
+        ready.wait()
+        start = time.perf_counter()
+        parts = pool.starmap(_run_student_threads, [
+            (db_path, menu, share, args.orders, args.seed) for share in shares if share
+        ])
+        elapsed = time.perf_counter() - start
+    return [r for part in parts for r in part], elapsed
+
+
+def summarize(results, elapsed, db_path, menu):
+    latencies = np.array([r['latency'] for r in results if r['outcome'] in ('ok', 'out_of_stock')])
+    outcomes = {}
+    for r in results:
+        outcomes[r['outcome']] = outcomes.get(r['outcome'], 0) + 1
+
+    order_ids = [r['order_id'] for r in results if r['order_id']]
+    sold = {}
+    for r in results:
+        for item_id, quantity in r['cart']:
+            sold[item_id] = sold.get(item_id, 0) + quantity
+
+    with sqlite3.connect(db_path) as conn:
+        final = dict(conn.execute(
+            "SELECT id, stock FROM food_items WHERE name LIKE 'Bench item %'").fetchall())
+        stored_orders = conn.execute(
+            "SELECT COUNT(*) FROM orders WHERE username LIKE 'bench%'").fetchone()[0]
+
+    mismatched = {
+        item_id: {'expected': stock - sold.get(item_id, 0), 'actual': final.get(item_id)}
+        for item_id, _, _, stock in menu
+        if final.get(item_id) != stock - sold.get(item_id, 0)
+    }
+
+    def percentile(q):
+        return round(float(np.percentile(latencies, q)) * 1000, 2) if len(latencies) else None
+
+    return {
+        'attempts': len(results),
+        'orders_placed': outcomes.get('ok', 0),
+        'orders_stored': stored_orders,
+        'out_of_stock': outcomes.get('out_of_stock', 0),
+        'locked_errors': outcomes.get('locked', 0),
+        'other_errors': outcomes.get('error', 0),
+        'duplicate_order_ids': len(order_ids) - len(set(order_ids)),
+        'oversold_items': sum(1 for stock in final.values() if stock < 0),
+        'stock_mismatches': mismatched,
+        'elapsed_s': round(elapsed, 3),
+        'orders_per_minute': round(outcomes.get('ok', 0) / elapsed * 60, 1) if elapsed else None,
+        'latency_ms': {'p50': percentile(50), 'p95': percentile(95), 'p99': percentile(99)},
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent checkout load test')
+    parser.add_argument('--db', default='database/canteen.db',
+                        help='database to copy (left untouched)')
+    parser.add_argument('--students', type=int, default=50)
+    parser.add_argument('--orders', type=int, default=20, help='orders per student')
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--workers', type=int, default=4, help='processes in process mode')
+    parser.add_argument('--items', type=int, default=20, help='benchmark menu items')
+    parser.add_argument('--stock', type=int, default=100, help='initial stock per item')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--write-queue', action='store_true',
+                        help='route writes through the single-writer queue (CANTEEN_WRITE_QUEUE=1)')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+    if args.write_queue:
+        # Read by every DatabaseManager, including those in worker processes
+        os.environ['CANTEEN_WRITE_QUEUE'] = '1'
+
+    workdir = tempfile.mkdtemp(prefix='canteen_bench_')
+    try:
+        db_path, menu = prepare_database(args.db, workdir, args.items, args.stock)
+        if args.mode == 'thread':
+            results, elapsed = _run_threads(db_path, menu, args)
+        else:
+            results, elapsed = _run_processes(db_path, menu, args)
+
+        report = {
+            'revision': _git_revision(),
+            'config': vars(args),
+            **summarize(results, elapsed, db_path, menu)
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
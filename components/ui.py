@@ -3,31 +3,49 @@ import pandas as pd
 from datetime import datetime
 
 def display_menu(menu_items, on_add_to_cart):
-    """Display food menu with add to cart functionality"""
-    for _, item in menu_items.iterrows():
+    """Display food menu (MenuItem rows) with add to cart functionality"""
+    if not menu_items:
+        st.info("No items found")
+        return
+    
+    for item in menu_items:
         col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
         
         with col1:
-            st.write(f"**{item['name']}** ({item['category']})")
+            st.write(f"**{item.name}** ({item.category})")
         
         with col2:
-            st.write(f"₹{item['price']:.2f}")
+            st.write(f"₹{item.price:.2f}")
         
         with col3:
-            st.write(f"Stock: {item['stock']}")
+            st.write(f"Stock: {item.stock}")
         
         with col4:
             quantity = st.number_input(
                 "Qty",
                 min_value=0,
-                max_value=item['stock'],
+                max_value=item.stock,
                 value=0,
-                key=f"qty_{item['id']}"
+                key=f"qty_{item.id}"
             )
             if quantity > 0:
-                if st.button("Add", key=f"add_{item['id']}"):
+                if st.button("Add", key=f"add_{item.id}"):
                     on_add_to_cart(item, quantity)
 
+def display_menu_filters(key, categories):
+    """Category selector and search box for a paged menu; returns (category, search)"""
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        category = st.selectbox("Category", ["All"] + categories, key=f"{key}_category",
+                                on_change=reset_offset, args=(key,))
+    
+    with col2:
+        search = st.text_input("Search", key=f"{key}_search",
+                               on_change=reset_offset, args=(key,))
+    
+    return (None if category == "All" else category), (search.strip() or None)
+
 def display_cart(cart_items, on_remove):
     """Display shopping cart"""
     if not cart_items:
@@ -61,35 +79,69 @@ def display_cart(cart_items, on_remove):
 def display_order_status(order_id, status):
     """Display order status with color coding"""
     status_colors = {
+        'pending_payment': '⏳',
+        'payment_failed': '🔴',
         'placed': '🟡',
         'preparing': '🟠',
         'prepared': '🟢'
     }
     
     status_messages = {
+        'pending_payment': 'Confirming your payment...',
+        'payment_failed': 'Payment failed. The order was cancelled; please try again.',
         'placed': 'Order placed successfully',
         'preparing': 'Your order is being prepared...',
         'prepared': 'Your order is ready! Please collect it.'
     }
     
     st.write(f"### Order #{order_id}")
-    st.write(f"{status_colors.get(status, '⚪')} Status: {status.title()}")
+    st.write(f"{status_colors.get(status, '⚪')} Status: {status.replace('_', ' ').title()}")
     st.info(status_messages.get(status, 'Status unknown'))
 
+def format_order_items(items, with_prices=False):
+    """Render decoded order lines as a markdown list"""
+    if with_prices:
+        return '\n'.join(f"- {item['quantity']}x {item['name']} (₹{item['price']:.2f})"
+                         for item in items)
+    return '\n'.join(f"- {item['quantity']}x {item['name']}" for item in items)
+
 def display_order_history(orders):
-    """Display order history in a table"""
-    if orders.empty:
+    """Display order history (Order rows) as expanders"""
+    if not orders:
         st.info("No orders found")
         return
     
-    for _, order in orders.iterrows():
-        with st.expander(f"Order #{order['order_id']} - {order['timestamp']}"):
-            st.write(f"**Status:** {order['status'].title()}")
-            st.write(f"**Payment:** {order['payment_method']}")
-            st.write(f"**Amount:** ₹{order['total_amount']:.2f}")
+    for order in orders:
+        with st.expander(f"Order #{order.order_id} - {order.timestamp}"):
+            st.write(f"**Status:** {order.status.replace('_', ' ').title()}")
+            st.write(f"**Payment:** {order.payment_method}")
+            st.write(f"**Amount:** ₹{order.total_amount:.2f}")
             st.write("**Items:**")
-            items = pd.read_json(order['items'])
-            st.dataframe(items[['name', 'quantity', 'price']])
+            st.markdown(format_order_items(order.items, with_prices=True))
+
+def display_prep_queue(prep_queue):
+    """Display quantities to prepare per item, grouped by category"""
+    if prep_queue.empty:
+        st.info("Nothing to prepare")
+        return
+    
+    # The queue is kept in session state between refreshes, so the age of
+    # its oldest order is computed here at render time rather than in SQL
+    now = pd.Timestamp.now(tz='UTC').tz_localize(None)
+    waiting = (now - pd.to_datetime(prep_queue['oldest_order'])).dt.total_seconds() // 60
+    prep_queue = prep_queue.assign(waiting_minutes=waiting.astype(int))
+    
+    for category, items in prep_queue.groupby('category', sort=False):
+        st.write(f"**{category}**")
+        st.dataframe(
+            items[['name', 'quantity', 'orders', 'waiting_minutes']].rename(columns={
+                'name': 'Item',
+                'quantity': 'Quantity',
+                'orders': 'Orders',
+                'waiting_minutes': 'Oldest (min)'
+            }),
+            hide_index=True
+        )
 
 def display_analytics(analytics_data):
     """Display analytics dashboard"""
@@ -103,4 +155,58 @@ def display_analytics(analytics_data):
     
     with col2:
         st.write("### Most Sold Items")
-        st.bar_chart(analytics_data['most_sold'].set_index('items'))
\ No newline at end of file
+        st.bar_chart(analytics_data['most_sold'].set_index('name')['quantity'])
+
+def get_page_cursor(key):
+    """Return the keyset cursor of the page currently shown for a paged list"""
+    pages = st.session_state.setdefault(f"{key}_pages", [None])
+    return pages[-1]
+
+def reset_pages(key):
+    """Go back to the first page of a paged list"""
+    st.session_state[f"{key}_pages"] = [None]
+
+def display_pager(key, next_cursor):
+    """Newer/older controls for a keyset-paginated list"""
+    pages = st.session_state.setdefault(f"{key}_pages", [None])
+    col1, col2, col3 = st.columns([1, 2, 1])
+    
+    with col1:
+        if len(pages) > 1 and st.button("← Newer", key=f"{key}_newer"):
+            pages.pop()
+            st.rerun()
+    
+    with col2:
+        st.caption(f"Page {len(pages)}")
+    
+    with col3:
+        if next_cursor is not None and st.button("Older →", key=f"{key}_older"):
+            pages.append(next_cursor)
+            st.rerun()
+
+def get_page_offset(key):
+    """Return the row offset of the page currently shown for an offset-paged list"""
+    return st.session_state.setdefault(f"{key}_offset", 0)
+
+def reset_offset(key):
+    """Go back to the first page of an offset-paged list"""
+    st.session_state[f"{key}_offset"] = 0
+
+def display_offset_pager(key, total, page_size):
+    """Previous/next controls for an offset-paginated list of total rows"""
+    offset = get_page_offset(key)
+    col1, col2, col3 = st.columns([1, 2, 1])
+    
+    with col1:
+        if offset > 0 and st.button("← Previous", key=f"{key}_previous"):
+            st.session_state[f"{key}_offset"] = max(0, offset - page_size)
+            st.rerun()
+    
+    with col2:
+        pages = max(1, -(-total // page_size))
+        st.caption(f"Page {offset // page_size + 1} of {pages} ({total} items)")
+    
+    with col3:
+        if offset + page_size < total and st.button("Next →", key=f"{key}_next"):
+            st.session_state[f"{key}_offset"] = offset + page_size
+            st.rerun()
@@ -0,0 +1,99 @@
+"""Time-bucketed order analytics computed over the history in chunks.
+
+Orders are streamed from SQLite chunk by chunk; each chunk is reduced to
+per-bucket sums with pandas/NumPy and folded into a running total, so
+memory depends on the number of buckets, not the number of orders.
+All times are UTC, like orders.timestamp.
+"""
+import numpy as np
+import pandas as pd
+
+# Bucket names accepted by time_series(), mapped to pandas offsets. Buckets
+# are resampled closed and labelled on the left, so a week is Monday-Sunday
+# labelled with its Monday (W-MON alone would label it with the next Monday)
+FREQUENCIES = {
+    'hour': 'h',
+    'day': 'D',
+    'week': 'W-MON',
+}
+
+CHUNK_SIZE = 50_000
+
+
+def _order_chunks(conn, clauses, params, chunk_size, with_items=True):
+    # One query per database, so each uses its own timestamp and order_items
+    # indexes; going through the history views scans every order line
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    items = '''
+        , (SELECT COALESCE(SUM(oi.quantity), 0)
+           FROM {db}.order_items oi WHERE oi.order_id = o.order_id) AS items
+    ''' if with_items else ''
+    part = f'SELECT o.timestamp, o.total_amount, o.prepared_at {items} FROM {{db}}.orders o {where}'
+    query = f"{part.format(db='main')} UNION ALL {part.format(db='archive')}"
+    return pd.read_sql_query(query, conn, params=list(params) * 2, chunksize=chunk_size)
+
+
+def time_series(conn, freq='day', clauses=(), params=(), chunk_size=CHUNK_SIZE):
+    """Revenue, order count, basket size and prep latency per time bucket.
+
+    Returns a DataFrame indexed by bucket start with columns revenue,
+    orders, avg_order_value, avg_basket_size and avg_prep_minutes (the
+    mean time from placing an order to it being marked prepared).
+    """
+    rule = FREQUENCIES[freq]
+    columns = ['revenue', 'orders', 'items', 'prep_minutes', 'prepared']
+    totals = pd.DataFrame(columns=columns, dtype=float)
+
+    for chunk in _order_chunks(conn, list(clauses), list(params), chunk_size):
+        placed = pd.to_datetime(chunk['timestamp'])
+        latency = (pd.to_datetime(chunk['prepared_at']) - placed).dt.total_seconds() / 60
+        sums = pd.DataFrame({
+            'revenue': chunk['total_amount'].to_numpy(dtype=float),
+            'orders': 1.0,
+            'items': chunk['items'].to_numpy(dtype=float),
+            'prep_minutes': latency.fillna(0).to_numpy(),
+            'prepared': latency.notna().to_numpy(dtype=float),
+        }, index=pd.DatetimeIndex(placed)).resample(rule, label='left', closed='left').sum()
+        totals = sums if totals.empty else totals.add(sums, fill_value=0)
+
+    if totals.empty:
+        return pd.DataFrame(columns=['revenue', 'orders', 'avg_order_value',
+                                     'avg_basket_size', 'avg_prep_minutes'])
+
+    # Fill gaps so empty buckets show as zero rather than disappearing
+    totals = totals.sort_index().resample(rule, label='left', closed='left').sum()
+    orders = totals['orders'].replace(0, np.nan)
+    return pd.DataFrame({
+        'revenue': totals['revenue'],
+        'orders': totals['orders'].astype(int),
+        'avg_order_value': totals['revenue'] / orders,
+        'avg_basket_size': totals['items'] / orders,
+        'avg_prep_minutes': totals['prep_minutes'] / totals['prepared'].replace(0, np.nan),
+    })
+
+
+def peak_hours(conn, clauses=(), params=(), chunk_size=CHUNK_SIZE):
+    """Order volume by hour of day and the busiest hour.
+
+    Returns {'profile': DataFrame indexed by hour (0-23) with orders,
+    revenue and avg_orders_per_day, 'peak_hour': int or None}.
+    """
+    orders = np.zeros(24)
+    revenue = np.zeros(24)
+    days = set()
+
+    for chunk in _order_chunks(conn, list(clauses), list(params), chunk_size, with_items=False):
+        placed = pd.to_datetime(chunk['timestamp'])
+        hours = placed.dt.hour.to_numpy()
+        orders += np.bincount(hours, minlength=24)
+        revenue += np.bincount(hours, weights=chunk['total_amount'].to_numpy(dtype=float),
+                               minlength=24)
+        days.update(placed.dt.normalize().unique())
+
+    profile = pd.DataFrame({
+        'orders': orders.astype(int),
+        'revenue': revenue,
+        'avg_orders_per_day': orders / max(len(days), 1),
+    }, index=pd.RangeIndex(24, name='hour'))
+    peak_hour = int(orders.argmax()) if orders.any() else None
+    return {'profile': profile, 'peak_hour': peak_hour}
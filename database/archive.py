@@ -0,0 +1,130 @@
+"""Archive database for old, completed orders.
+
+Every pooled connection ATTACHes the archive file as `archive` and defines
+the temp views order_history and order_item_history (main UNION ALL
+archive), so history, analytics and export queries see archived orders
+without knowing where they live.
+
+Orders are moved in batches by DatabaseManager.archive_orders(), each batch
+copied and deleted in one transaction. WAL commits are not atomic across
+attached databases, though: SQLite commits each file in turn, main first.
+The move therefore runs on its own connection with the archive as main and
+the order database attached. A crash between the two commits can leave an
+order in both files (the next run copies it again and finishes the
+delete) but never in neither, and a query that starts during the commit
+may briefly count a batch twice, never miss it.
+"""
+import json
+import sqlite3
+
+BATCH_SIZE = 500
+
+ORDER_COLUMNS = ('order_id', 'username', 'items', 'total_amount', 'payment_method',
+                 'payment_id', 'status', 'timestamp', 'change_seq', 'prepared_at')
+ITEM_COLUMNS = ('order_id', 'item_id', 'name', 'unit_price', 'quantity')
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS archive.orders (
+        order_id TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        items TEXT NOT NULL,
+        total_amount REAL NOT NULL,
+        payment_method TEXT NOT NULL,
+        payment_id TEXT,
+        status TEXT NOT NULL,
+        timestamp DATETIME,
+        change_seq INTEGER,
+        prepared_at DATETIME
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS archive.order_items (
+        order_id TEXT NOT NULL,
+        item_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        unit_price REAL NOT NULL,
+        quantity INTEGER NOT NULL
+    )
+    ''',
+    # Same access paths as the hot orders table
+    'CREATE INDEX IF NOT EXISTS archive.idx_orders_user_time ON orders(username, timestamp, order_id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_orders_status_time ON orders(status, timestamp, order_id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_orders_time ON orders(timestamp, order_id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_orders_payment_id ON orders(payment_id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_order_items_order ON order_items(order_id)',
+)
+
+_ORDERS = ', '.join(ORDER_COLUMNS)
+_ITEMS = ', '.join(ITEM_COLUMNS)
+
+VIEWS = (
+    f'''
+    CREATE TEMP VIEW IF NOT EXISTS order_history AS
+    SELECT {_ORDERS} FROM main.orders
+    UNION ALL
+    SELECT {_ORDERS} FROM archive.orders
+    ''',
+    f'''
+    CREATE TEMP VIEW IF NOT EXISTS order_item_history AS
+    SELECT {_ITEMS} FROM main.order_items
+    UNION ALL
+    SELECT {_ITEMS} FROM archive.order_items
+    ''',
+)
+
+
+def attach(conn, path):
+    """Attach the archive at path to a new connection and define the history views"""
+    conn.execute('ATTACH DATABASE ? AS archive', (path,))
+    conn.execute('PRAGMA archive.journal_mode = WAL')
+    for statement in SCHEMA + VIEWS:
+        conn.execute(statement)
+
+
+def move_batch(db_path, archive_path, older_than_days, batch_size=BATCH_SIZE, timeout=10.0):
+    """Move up to batch_size prepared orders older than N days from db_path
+    into the archive in one transaction; returns their order IDs"""
+    # The archive is this connection's main database, so it commits first
+    conn = sqlite3.connect(archive_path, timeout=timeout, isolation_level=None)
+    try:
+        conn.execute('ATTACH DATABASE ? AS hot', (db_path,))
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            order_ids = [row[0] for row in conn.execute('''
+                SELECT order_id FROM hot.orders
+                WHERE status = 'prepared' AND timestamp < datetime('now', ?)
+                ORDER BY timestamp, order_id
+                LIMIT ?
+            ''', (f'-{older_than_days} days', batch_size))]
+            if order_ids:
+                _copy(conn, json.dumps(order_ids))
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        return order_ids
+    finally:
+        conn.close()
+
+
+def _copy(conn, batch):
+    conn.execute(f'''
+        INSERT OR REPLACE INTO main.orders ({_ORDERS})
+        SELECT {_ORDERS} FROM hot.orders
+        WHERE order_id IN (SELECT value FROM json_each(?))
+    ''', (batch,))
+    # Lines of an order copied by an interrupted earlier run are replaced
+    conn.execute('''
+        DELETE FROM main.order_items WHERE order_id IN (SELECT value FROM json_each(?))
+    ''', (batch,))
+    conn.execute(f'''
+        INSERT INTO main.order_items ({_ITEMS})
+        SELECT {_ITEMS} FROM hot.order_items
+        WHERE order_id IN (SELECT value FROM json_each(?))
+    ''', (batch,))
+    conn.execute('DELETE FROM hot.order_items WHERE order_id IN (SELECT value FROM json_each(?))',
+                 (batch,))
+    conn.execute('DELETE FROM hot.orders WHERE order_id IN (SELECT value FROM json_each(?))',
+                 (batch,))
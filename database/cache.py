@@ -0,0 +1,80 @@
+import contextvars
+import threading
+
+# RequestScope of the Streamlit script run executing in this context, if any
+active_scope = contextvars.ContextVar('active_scope', default=None)
+
+
+class MenuCache:
+    """Process-wide cache of the active menu, keyed by the menu version counter.
+
+    Every change to food_items bumps the 'menu' counter (see migrations), so
+    a cached menu is served until the stored version no longer matches.
+    """
+
+    _caches = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._menu = None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_path(cls, db_path):
+        """Return the process-wide cache for db_path"""
+        with cls._caches_lock:
+            cache = cls._caches.get(db_path)
+            if cache is None:
+                cache = cls()
+                cls._caches[db_path] = cache
+            return cache
+
+    def get(self, version):
+        """Return the cached menu if it matches version, else None"""
+        with self._lock:
+            if self._menu is not None and self._version == version:
+                self.hits += 1
+                return self._menu
+            self.misses += 1
+            return None
+
+    def put(self, version, menu):
+        with self._lock:
+            if self._version is None or version >= self._version:
+                self._version = version
+                self._menu = menu
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'version': self._version
+            }
+
+
+class RequestScope:
+    """Per-rerun memo of read results, cleared whenever a write commits"""
+
+    def __init__(self):
+        self._results = {}
+        self.queries = 0
+        self.hits = 0
+        self.statements = 0
+
+    def lookup(self, key):
+        """Return (found, result) for a memoized read"""
+        if key in self._results:
+            self.hits += 1
+            return True, self._results[key]
+        return False, None
+
+    def store(self, key, result):
+        self.queries += 1
+        self._results[key] = result
+
+    def clear(self):
+        self._results.clear()
@@ -1,142 +1,933 @@
-import sqlite3
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
+from contextlib import contextmanager
+import functools
 import json
+import os
+import re
+import threading
+from database import analytics, archive, export, menu_io, migrations, rollups
+from database.cache import MenuCache, RequestScope, active_scope
+from database.instrumentation import STATS, timed
+from database.pool import ConnectionPool
+from database.rows import MenuItem, Order, User
+from database.writer import WriteQueue
+
+try:
+    # Optional fast JSON decoder for order item lists
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+def transactional(method):
+    """Run a write method inside one BEGIN IMMEDIATE transaction.
+
+    The wrapped method receives the pooled connection as its first argument
+    after self; callers do not pass it. In write-queue mode the method runs
+    on the writer thread, batched with other writes (see database.writer),
+    and the caller waits for the batch to commit (see WriteQueue.run for
+    the timeout).
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.write_queue:
+            result = self.writer.run(lambda conn: method(self, conn, *args, **kwargs))
+            _clear_active_scope()
+            return result
+        with self.transaction() as conn:
+            return method(self, conn, *args, **kwargs)
+    return timed(wrapper)
+
+
+def _clear_active_scope():
+    # Reads memoized earlier in this rerun may be stale after a write
+    scope = active_scope.get()
+    if scope is not None:
+        scope.clear()
+
+
+def memoized_read(method):
+    """Serve repeated identical reads from the active request scope, if any"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        scope = active_scope.get()
+        if scope is None:
+            return method(self, *args, **kwargs)
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            found, result = scope.lookup(key)
+        except TypeError:
+            # Unhashable arguments: skip the memo
+            return method(self, *args, **kwargs)
+        if not found:
+            result = method(self, *args, **kwargs)
+            scope.store(key, result)
+        return result
+    return timed(wrapper)
+
+
+_BASE36 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def _base36(number, width):
+    """Fixed-width uppercase base-36 digits of a non-negative integer"""
+    digits = ''
+    while number:
+        number, digit = divmod(number, 36)
+        digits = _BASE36[digit] + digits
+    return digits.rjust(width, '0')
+
+
+def read_orders(cursor):
+    """Build Order rows from a cursor over Order.columns(), decoding items"""
+    orders = [Order(*row) for row in cursor]
+    for order in orders:
+        order.items = _loads(order.items)
+    return orders
+
+
+# Words of a menu search query; anything else (quotes, FTS operators) is dropped
+_SEARCH_TERM = re.compile(r'\w+')
+
+# Minutes an add-to-cart stock hold lasts before it lapses
+HOLD_TTL_MINUTES = 10
+
+# Quantity of food item f held by unexpired cart holds; {others} optionally
+# excludes the ordering user's own holds
+_HELD_STOCK = '''(
+    SELECT COALESCE(SUM(h.quantity), 0) FROM stock_holds h
+    WHERE h.item_id = f.id AND h.expires_at > CURRENT_TIMESTAMP{others}
+)'''
+
+
+def _menu_columns():
+    """MenuItem SELECT list over food_items f, with stock net of holds"""
+    return ', '.join(f"f.stock - {_HELD_STOCK.format(others='')} AS stock" if name == 'stock'
+                     else f'f.{name}' for name in MenuItem.__slots__)
+
+
+# Orders the kitchen still has to work on
+ACTIVE_STATUSES = ('placed', 'preparing')
+
+# Online payments: created pending, then confirmed ('placed') or failed
+PENDING_PAYMENT = 'pending_payment'
+PAYMENT_FAILED = 'payment_failed'
+
+DEFAULT_DB_PATH = 'database/canteen.db'
+
+
+class InsufficientStockError(Exception):
+    """Raised when an order cannot be filled from current stock"""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls
+        names = ', '.join(
+            f"{s['name']} (requested {s['requested']}, available {s['available']})"
+            for s in shortfalls)
+        super().__init__(f"Insufficient stock: {names}")
+
 
 class DatabaseManager:
-    def __init__(self, db_path='database/canteen.db'):
+    # Database files already migrated by this process
+    _migrated = set()
+    _migrated_lock = threading.Lock()
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, archive_path=None, write_queue=None):
         self.db_path = db_path
-    
-    def get_connection(self):
-        return sqlite3.connect(self.db_path)
-    
-    def get_menu_items(self):
-        conn = self.get_connection()
-        query = '''
-            SELECT * FROM food_items 
-            WHERE active = 1 AND (stock > 0 OR validity_type = 'daily')
+        # Old orders live in a separate file next to the main database.
+        # CANTEEN_ARCHIVE_DB moves the app database's archive only; other
+        # databases (benchmark copies) keep theirs next to them
+        if archive_path is None:
+            archive_path = f'{os.path.splitext(db_path)[0]}_archive.db'
+            if os.path.abspath(db_path) == os.path.abspath(DEFAULT_DB_PATH):
+                archive_path = os.environ.get('CANTEEN_ARCHIVE_DB', archive_path)
+        self.archive_path = archive_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.menu_cache = MenuCache.for_path(db_path)
+        self.migrate()
+        # Optional single-writer queue with group commit
+        if write_queue is None:
+            write_queue = os.environ.get('CANTEEN_WRITE_QUEUE') == '1'
+        self.write_queue = write_queue
+
+    # Looked up on use rather than stored, so a manager carried into a forked
+    # child uses that process's connections and writer thread
+
+    @property
+    def pool(self):
+        return ConnectionPool.for_path(self.db_path, archive_path=self.archive_path)
+
+    @property
+    def writer(self):
+        return WriteQueue.for_pool(self.pool) if self.write_queue else None
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for reads"""
+        with self.pool.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a pooled connection wrapped in a write transaction"""
+        with self.pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        _clear_active_scope()
+
+    @contextmanager
+    def request_scope(self):
+        """Deduplicate identical reads for the duration of one script run.
+
+        Yields the RequestScope, whose queries/hits counters record how many
+        reads went to the database and how many were served from the memo.
+        """
+        scope = RequestScope()
+        token = active_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            active_scope.reset(token)
+            STATS.record_rerun(scope)
+
+    def migrate(self):
+        """Bring the schema up to date; a no-op after the first call per process"""
+        with DatabaseManager._migrated_lock:
+            if self.db_path in DatabaseManager._migrated:
+                return
+            with self.connection() as conn:
+                migrations.migrate(conn)
+            DatabaseManager._migrated.add(self.db_path)
+
+    @timed
+    def authenticate(self, username, password, role):
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT * FROM users WHERE username=? AND password=? AND LOWER(role)=LOWER(?)',
+                     (username, password, role))
+            return c.fetchone()
+
+    @memoized_read
+    def get_users(self):
+        """Return all users as User rows"""
+        with self.connection() as conn:
+            return [User(*row) for row in conn.execute(
+                f'SELECT {User.columns()} FROM users ORDER BY username')]
+
+    @transactional
+    def add_user(self, conn, username, password, role):
+        conn.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)',
+                    (username, password, role))
+
+    @transactional
+    def reset_password(self, conn, username, password='password123'):
+        conn.execute('UPDATE users SET password = ? WHERE username = ?',
+                    (password, username))
+
+    @transactional
+    def delete_user(self, conn, username):
+        conn.execute('DELETE FROM users WHERE username = ?', (username,))
+
+    def _active_menu(self):
+        """Every active item as MenuItem rows, by category then name, shared
+        by all sessions until food_items changes.
+
+        The returned tuple is cached process-wide; treat it as read-only.
+        """
+        query = f'''
+            SELECT {MenuItem.columns()} FROM food_items
+            WHERE active = 1 ORDER BY category, name, id
         '''
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
-    
-    def update_stock(self, item_id, quantity):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute('''
-            UPDATE food_items 
-            SET stock = stock - ? 
+        with self.connection() as conn:
+            version = self._menu_version(conn)
+            menu = self.menu_cache.get(version)
+            if menu is not None:
+                return menu
+
+            # Read the version and the menu from one snapshot
+            conn.execute('BEGIN')
+            try:
+                version = self._menu_version(conn)
+                menu = tuple(MenuItem(*row) for row in conn.execute(query))
+            finally:
+                conn.execute('COMMIT')
+        self.menu_cache.put(version, menu)
+        return menu
+
+    @memoized_read
+    def get_menu_items(self):
+        """Return the orderable menu (in stock or daily) as MenuItem rows"""
+        return tuple(item for item in self._active_menu()
+                     if item.stock > 0 or item.validity_type == 'daily')
+
+    @memoized_read
+    def _menu_listing(self, available_only=True):
+        """The cached active menu; with available_only, only orderable items,
+        with stock net of unexpired cart holds"""
+        menu = self._active_menu()
+        if not available_only:
+            return menu
+        with self.connection() as conn:
+            held = dict(conn.execute('''
+                SELECT item_id, SUM(quantity) FROM stock_holds
+                WHERE expires_at > CURRENT_TIMESTAMP GROUP BY item_id
+            '''))
+        listing = []
+        for item in menu:
+            if item.validity_type == 'daily':
+                listing.append(item)
+            elif item.stock > held.get(item.id, 0):
+                if item.id in held:
+                    # Cached rows are shared; copy before adjusting
+                    item = MenuItem(*(getattr(item, name) for name in MenuItem.__slots__))
+                    item.stock -= held[item.id]
+                listing.append(item)
+        return tuple(listing)
+
+    def _menu_filters(self, category=None):
+        """Build the WHERE clause (over food_items f) for orderable menu items"""
+        clauses = ['f.active = 1',
+                   f"(f.stock > {_HELD_STOCK.format(others='')} OR f.validity_type = 'daily')"]
+        params = []
+        if category is not None:
+            clauses.append('f.category = ?')
+            params.append(category)
+        return clauses, params
+
+    @memoized_read
+    def get_menu_page(self, category=None, search=None, offset=0, limit=20,
+                      available_only=True):
+        """Return one page of MenuItem rows (by category, then name) and the
+        total number of matching items.
+
+        Pages are cut from the cached menu, so a rerun costs the menu version
+        check plus, with available_only (the student menu), one read of the
+        holds: stock is what is left after other carts' holds.
+        available_only=False lists every active item with its raw stock, for
+        the admin item list. search is a case-insensitive substring of the name.
+        """
+        needle = search.casefold() if search else None
+        items = [item for item in self._menu_listing(available_only)
+                 if (category is None or item.category == category)
+                 and (needle is None or needle in item.name.casefold())]
+        return items[offset:offset + limit], len(items)
+
+    @memoized_read
+    def search_menu(self, query, limit=20, category=None):
+        """Return orderable MenuItem rows matching query, best match first.
+
+        Every word of the query must prefix-match a word of the item's name
+        or category ("pan" finds "Paneer Tikka"); results are ranked with
+        bm25, weighting name matches above category matches.
+        """
+        terms = _SEARCH_TERM.findall(query or '')
+        if not terms:
+            return []
+        clauses, params = self._menu_filters(category)
+        clauses.insert(0, 'food_items_fts MATCH ?')
+        params.insert(0, ' '.join(f'"{term}"*' for term in terms))
+        with self.connection() as conn:
+            return [MenuItem(*row) for row in conn.execute(f'''
+                SELECT {_menu_columns()}
+                FROM food_items_fts JOIN food_items f ON f.id = food_items_fts.rowid
+                WHERE {' AND '.join(clauses)}
+                ORDER BY bm25(food_items_fts, 10.0, 1.0), f.name
+                LIMIT ?
+            ''', params + [limit])]
+
+    @memoized_read
+    def get_menu_categories(self, available_only=True):
+        """Categories that have at least one matching active item"""
+        return sorted({item.category for item in self._menu_listing(available_only)})
+
+    def _menu_version(self, conn):
+        return conn.execute("SELECT value FROM counters WHERE name = 'menu'").fetchone()[0]
+
+    def menu_cache_stats(self):
+        """Hit/miss counters and cached version of the process-wide menu cache"""
+        return self.menu_cache.stats()
+
+    @transactional
+    def update_stock(self, conn, item_id, quantity):
+        conn.execute('''
+            UPDATE food_items
+            SET stock = stock - ?
             WHERE id = ? AND validity_type != 'daily'
         ''', (quantity, item_id))
-        conn.commit()
-        conn.close()
-    
-    def create_order(self, username, items, total_amount, payment_method, payment_id=None):
-        conn = self.get_connection()
-        c = conn.cursor()
-        
-        order_id = f"ORD{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        items_json = json.dumps(items)
-        
-        c.execute('''
-            INSERT INTO orders (order_id, username, items, total_amount, 
-                              payment_method, payment_id, status)
-            VALUES (?, ?, ?, ?, ?, ?, 'placed')
-        ''', (order_id, username, items_json, total_amount, payment_method, payment_id))
-        
-        conn.commit()
-        conn.close()
+
+    def _next_counter(self, conn, name):
+        """Increment and return a named counter; must run inside a write transaction"""
+        return conn.execute('''
+            INSERT INTO counters (name, value) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1
+            RETURNING value
+        ''', (name,)).fetchone()[0]
+
+    def _next_order_id(self, conn):
+        """Return a short, time-sortable order ID such as ORD250417-00004Z.
+
+        The per-day sequence lives in the database and is bumped under the
+        write lock of the enclosing transaction, so IDs are unique across
+        threads and worker processes regardless of order rate. The day is
+        the UTC date, like orders.timestamp. The sequence is written as six
+        fixed-width base-36 characters (0-9 then A-Z, which sort in ASCII
+        order), enough for ~2 billion orders a day before IDs stop sorting.
+        """
+        day = datetime.now(timezone.utc).strftime('%y%m%d')
+        seq = self._next_counter(conn, f'order:{day}')
+        return f"ORD{day}-{_base36(seq, 6)}"
+
+    def _insert_order(self, conn, username, items, total_amount, payment_method, payment_id,
+                      status='placed'):
+        order_id = self._next_order_id(conn)
+        # Cart lines may carry session-only keys such as hold_id; keep the order lines
+        items_json = json.dumps([{key: item[key] for key in ('id', 'name', 'price', 'quantity')}
+                                 for item in items])
+
+        conn.execute('''
+            INSERT INTO orders (order_id, username, items, total_amount,
+                              payment_method, payment_id, status, change_seq)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (order_id, username, items_json, total_amount, payment_method, payment_id,
+              status, self._next_counter(conn, 'order_changes')))
+
+        conn.executemany('''
+            INSERT INTO order_items (order_id, item_id, name, unit_price, quantity)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(order_id, item['id'], item['name'], item['price'], item['quantity'])
+              for item in items])
+
+        rollups.record_order(conn, order_id)
         return order_id
-    
-    def get_user_orders(self, username):
-        conn = self.get_connection()
-        query = '''
-            SELECT * FROM orders 
-            WHERE username = ? 
-            ORDER BY timestamp DESC
-        '''
-        df = pd.read_sql_query(query, conn, params=[username])
-        conn.close()
-        return df
-    
-    def get_all_orders(self, status=None):
-        conn = self.get_connection()
-        if status:
-            query = 'SELECT * FROM orders WHERE status = ? ORDER BY timestamp DESC'
-            df = pd.read_sql_query(query, conn, params=[status])
-        else:
-            query = 'SELECT * FROM orders ORDER BY timestamp DESC'
-            df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
-    
-    def update_order_status(self, order_id, status):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute('UPDATE orders SET status = ? WHERE order_id = ?',
-                 (status, order_id))
-        conn.commit()
-        conn.close()
-    
-    def add_food_item(self, name, price, category, stock, validity_type):
-        conn = self.get_connection()
+
+    @transactional
+    def create_order(self, conn, username, items, total_amount, payment_method, payment_id=None):
+        return self._insert_order(conn, username, items, total_amount, payment_method, payment_id)
+
+    @transactional
+    def place_order(self, conn, username, items, total_amount, payment_method, payment_id=None,
+                    status='placed'):
+        """Decrement stock for every cart line and insert the order atomically.
+
+        Raises InsufficientStockError (after rolling back) if any line cannot
+        be filled; daily items are not stock-tracked and always pass. Online
+        payments pass status=PENDING_PAYMENT so the stock is held while the
+        payment is captured (see confirm_payment/fail_payment).
+        """
+        # Merge repeated cart lines for the same item
+        quantities = {}
+        for item in items:
+            quantities[item['id']] = quantities.get(item['id'], 0) + int(item['quantity'])
+
+        # Other students' holds are off limits; the caller's own holds are
+        # converted into the order
         c = conn.cursor()
-        c.execute('''
+        c.execute('SAVEPOINT stock_check')
+        c.executemany(f'''
+            UPDATE food_items AS f
+            SET stock = CASE WHEN validity_type = 'daily' THEN stock ELSE stock - ? END
+            WHERE id = ? AND active = 1
+              AND (validity_type = 'daily'
+                   OR stock - {_HELD_STOCK.format(others=' AND h.username != ?')} >= ?)
+        ''', [(qty, item_id, username, qty) for item_id, qty in quantities.items()])
+
+        if c.rowcount != len(quantities):
+            # Undo the partial decrement so the report shows pre-order stock
+            c.execute('ROLLBACK TO stock_check')
+            raise InsufficientStockError(
+                self._stock_shortfalls(conn, items, quantities, username))
+        c.execute('RELEASE stock_check')
+
+        c.execute(f'''
+            DELETE FROM stock_holds
+            WHERE username = ? AND item_id IN ({','.join('?' * len(quantities))})
+        ''', [username, *quantities])
+
+        return self._insert_order(conn, username, items, total_amount, payment_method, payment_id,
+                                  status)
+
+    def _stock_shortfalls(self, conn, items, quantities, username=None):
+        """Lines that cannot be filled, with the stock available to username"""
+        names = {item['id']: item['name'] for item in items}
+        placeholders = ','.join('?' * len(quantities))
+        rows = {
+            row[0]: row[1:]
+            for row in conn.execute(
+                f'''SELECT id, stock - {_HELD_STOCK.format(others=' AND h.username IS NOT ?')},
+                           validity_type, active
+                    FROM food_items f WHERE id IN ({placeholders})''',
+                [username, *quantities])
+        }
+
+        shortfalls = []
+        for item_id, requested in quantities.items():
+            stock, validity_type, active = rows.get(item_id, (0, 'regular', 0))
+            if active and (validity_type == 'daily' or stock >= requested):
+                continue
+            shortfalls.append({
+                'item_id': item_id,
+                'name': names.get(item_id, str(item_id)),
+                'requested': requested,
+                'available': max(stock, 0) if active else 0
+            })
+        return shortfalls
+
+    @transactional
+    def hold_stock(self, conn, username, item_id, quantity, ttl_minutes=HOLD_TTL_MINUTES):
+        """Reserve quantity of an item for username's cart; returns the hold_id.
+
+        Raises InsufficientStockError if fewer are available once other
+        holds are taken into account. Daily items are not stock-tracked and
+        get no hold (returns None). Adding to the cart also extends the
+        user's other holds, so an active cart does not lapse piecemeal.
+        """
+        self._sweep_holds(conn)
+        row = conn.execute(f'''
+            SELECT name, validity_type, active, f.stock - {_HELD_STOCK.format(others='')}
+            FROM food_items f WHERE id = ?
+        ''', (item_id,)).fetchone()
+        if row is None or not row[2] or (row[1] != 'daily' and row[3] < quantity):
+            raise InsufficientStockError([{
+                'item_id': item_id,
+                'name': row[0] if row else str(item_id),
+                'requested': quantity,
+                'available': max(row[3], 0) if row and row[2] else 0
+            }])
+        if row[1] == 'daily':
+            return None
+
+        expires = f'{ttl_minutes:+d} minutes'
+        conn.execute('''
+            UPDATE stock_holds SET expires_at = datetime('now', ?) WHERE username = ?
+        ''', (expires, username))
+        return conn.execute('''
+            INSERT INTO stock_holds (username, item_id, quantity, expires_at)
+            VALUES (?, ?, ?, datetime('now', ?))
+            RETURNING hold_id
+        ''', (username, item_id, quantity, expires)).fetchone()[0]
+
+    @transactional
+    def release_hold(self, conn, hold_id):
+        conn.execute('DELETE FROM stock_holds WHERE hold_id = ?', (hold_id,))
+
+    @transactional
+    def release_holds(self, conn, username):
+        """Drop every hold of a user, e.g. on logout"""
+        conn.execute('DELETE FROM stock_holds WHERE username = ?', (username,))
+
+    def _sweep_holds(self, conn):
+        # Lazy sweeper: expired holds are ignored by every query, and deleted
+        # here whenever a new hold is taken
+        conn.execute('DELETE FROM stock_holds WHERE expires_at <= CURRENT_TIMESTAMP')
+
+    def _order_filters(self, status=None, username=None, start=None, end=None):
+        """Build the WHERE clause shared by the order queries"""
+        clauses, params = [], []
+        if username is not None:
+            clauses.append('username = ?')
+            params.append(username)
+        if isinstance(status, str):
+            clauses.append('status = ?')
+            params.append(status)
+        elif status:
+            clauses.append(f"status IN ({','.join('?' * len(status))})")
+            params.extend(status)
+        if start is not None:
+            clauses.append('timestamp >= ?')
+            params.append(str(start))
+        if end is not None:
+            clauses.append('timestamp < ?')
+            params.append(str(end))
+        return clauses, params
+
+    def get_user_orders(self, username, status=None):
+        return self.get_all_orders(status=status, username=username)
+
+    @memoized_read
+    def get_all_orders(self, status=None, username=None, start=None, end=None):
+        """Return matching Order rows (archived included), newest first; status
+        may be a value or a list. Each order's items are decoded lists of
+        cart lines.
+        """
+        clauses, params = self._order_filters(status, username, start, end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        query = f'''
+            SELECT {Order.columns()} FROM order_history {where}
+            ORDER BY timestamp DESC, order_id DESC
+        '''
+        with self.connection() as conn:
+            return read_orders(conn.execute(query, params))
+
+    @memoized_read
+    def get_orders_page(self, status=None, username=None, start=None, end=None,
+                        cursor=None, page_size=20):
+        """Return one page of Order rows (newest first, archived included) and the
+        cursor for the next.
+
+        cursor is the (timestamp, order_id) of the last row of the previous
+        page, or None for the first page; the returned cursor is None when
+        there are no more rows.
+        """
+        clauses, params = self._order_filters(status, username, start, end)
+        if cursor is not None:
+            clauses.append('(timestamp, order_id) < (?, ?)')
+            params.extend(cursor)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        # One index walk per database, each stopping after a page; reading
+        # through the order_history view would sort every matching row
+        part = f'''
+            SELECT * FROM (
+                SELECT {Order.columns()} FROM {{table}} {where}
+                ORDER BY timestamp DESC, order_id DESC LIMIT ?
+            )
+        '''
+        query = f'''
+            {part.format(table='main.orders')}
+            UNION ALL
+            {part.format(table='archive.orders')}
+            ORDER BY timestamp DESC, order_id DESC
+            LIMIT ?
+        '''
+        limit = page_size + 1
+        with self.connection() as conn:
+            page = read_orders(conn.execute(query, params + [limit] + params + [limit, limit]))
+
+        next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            next_cursor = (page[-1].timestamp, page[-1].order_id)
+        return page, next_cursor
+
+    @transactional
+    def update_order_status(self, conn, order_id, status):
+        row = conn.execute('SELECT status FROM orders WHERE order_id = ?',
+                          (order_id,)).fetchone()
+        if row is None or row[0] == status:
+            return
+        conn.execute('''
+            UPDATE orders
+            SET status = ?, change_seq = ?,
+                prepared_at = CASE WHEN ? = 'prepared' THEN CURRENT_TIMESTAMP ELSE prepared_at END
+            WHERE order_id = ?
+        ''', (status, self._next_counter(conn, 'order_changes'), status, order_id))
+        rollups.record_status_change(conn, order_id, row[0], status)
+
+    @transactional
+    def confirm_payment(self, conn, order_id, payment_id):
+        """Flip a pending order to 'placed'; returns False if it was not pending"""
+        updated = conn.execute('''
+            UPDATE orders SET status = 'placed', payment_id = ?, change_seq = ?
+            WHERE order_id = ? AND status = ?
+        ''', (payment_id, self._next_counter(conn, 'order_changes'), order_id,
+              PENDING_PAYMENT)).rowcount
+        if updated:
+            rollups.record_status_change(conn, order_id, PENDING_PAYMENT, 'placed')
+        return bool(updated)
+
+    @transactional
+    def fail_payment(self, conn, order_id, reason=None):
+        """Mark a pending order as payment_failed and put its stock back.
+
+        Returns False if the order was not pending. The reason is kept in
+        orders.payment_error.
+        """
+        updated = conn.execute('''
+            UPDATE orders SET status = ?, payment_error = ?, change_seq = ?
+            WHERE order_id = ? AND status = ?
+        ''', (PAYMENT_FAILED, reason,
+              self._next_counter(conn, 'order_changes'), order_id,
+              PENDING_PAYMENT)).rowcount
+        if not updated:
+            return False
+
+        conn.execute('''
+            UPDATE food_items
+            SET stock = stock + (SELECT SUM(quantity) FROM order_items oi
+                                 WHERE oi.order_id = ? AND oi.item_id = food_items.id)
+            WHERE validity_type != 'daily'
+              AND id IN (SELECT item_id FROM order_items WHERE order_id = ?)
+        ''', (order_id, order_id))
+        rollups.record_status_change(conn, order_id, PENDING_PAYMENT, PAYMENT_FAILED)
+        rollups.remove_sales(conn, order_id)
+        return True
+
+    @timed
+    def get_pending_payments(self):
+        """(order_id, total_amount) of every order still awaiting payment"""
+        with self.connection() as conn:
+            return conn.execute('SELECT order_id, total_amount FROM orders WHERE status = ?',
+                                (PENDING_PAYMENT,)).fetchall()
+
+    @timed
+    def get_orders_by_payment_ids(self, payment_ids):
+        """Orders whose payment_id is in payment_ids, matched in one join.
+
+        The IDs are loaded into a temp table and joined through the
+        payment_id index of each database instead of being looked up one by
+        one; joining the order_history view would scan both orders tables.
+        """
+        # CROSS JOIN keeps the ID list as the outer loop
+        part = '''
+            SELECT o.order_id, o.payment_id, o.total_amount, o.status, o.timestamp
+            FROM temp.payment_ids p CROSS JOIN {table} o ON o.payment_id = p.payment_id
+        '''
+        query = f'''
+            {part.format(table='main.orders')}
+            UNION ALL
+            {part.format(table='archive.orders')}
+        '''
+        with self.connection() as conn:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS payment_ids (payment_id TEXT PRIMARY KEY)')
+            conn.execute('BEGIN')
+            try:
+                conn.executemany('INSERT OR IGNORE INTO temp.payment_ids VALUES (?)',
+                                 ((payment_id,) for payment_id in payment_ids))
+                return pd.read_sql_query(query, conn)
+            finally:
+                conn.execute('ROLLBACK')
+
+    @timed
+    def get_paid_orders(self, start=None, end=None):
+        """Online orders in [start, end) whose payment was confirmed"""
+        clauses, params = self._order_filters(start=start, end=end)
+        clauses.append("payment_method = 'razorpay'")
+        clauses.append(f"status NOT IN ('{PENDING_PAYMENT}', '{PAYMENT_FAILED}')")
+        query = f'''
+            SELECT order_id, payment_id, total_amount, status, timestamp
+            FROM order_history WHERE {' AND '.join(clauses)}
+        '''
+        with self.connection() as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+    @timed
+    def get_order_change_seq(self):
+        """Return the latest order change sequence number"""
+        with self.connection() as conn:
+            return conn.execute(
+                "SELECT value FROM counters WHERE name = 'order_changes'").fetchone()[0]
+
+    @timed
+    def get_order_changes(self, since_seq):
+        """Return Order rows created or updated after since_seq, oldest change first.
+
+        Returns (orders, last_seq); pass last_seq back in on the next call.
+        """
+        query = f'''
+            SELECT {Order.columns()} FROM orders
+            WHERE change_seq > ?
+            ORDER BY change_seq
+        '''
+        with self.connection() as conn:
+            changes = read_orders(conn.execute(query, (since_seq,)))
+        last_seq = changes[-1].change_seq if changes else since_seq
+        return changes, last_seq
+
+    @transactional
+    def add_food_item(self, conn, name, price, category, stock, validity_type):
+        conn.execute('''
             INSERT INTO food_items (name, price, category, stock, validity_type)
             VALUES (?, ?, ?, ?, ?)
         ''', (name, price, category, stock, validity_type))
-        conn.commit()
-        conn.close()
-    
-    def update_food_item(self, item_id, name, price, category, stock, validity_type):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute('''
-            UPDATE food_items 
+
+    @transactional
+    def update_food_item(self, conn, item_id, name, price, category, stock, validity_type):
+        conn.execute('''
+            UPDATE food_items
             SET name = ?, price = ?, category = ?, stock = ?, validity_type = ?
             WHERE id = ?
         ''', (name, price, category, stock, validity_type, item_id))
-        conn.commit()
-        conn.close()
-    
-    def delete_food_item(self, item_id):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute('UPDATE food_items SET active = 0 WHERE id = ?', (item_id,))
-        conn.commit()
-        conn.close()
-    
-    def reset_daily_items(self):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("UPDATE food_items SET stock = 0 WHERE validity_type = 'daily'")
-        conn.commit()
-        conn.close()
-    
+
+    @transactional
+    def delete_food_item(self, conn, item_id):
+        conn.execute('UPDATE food_items SET active = 0 WHERE id = ?', (item_id,))
+
+    @transactional
+    def import_menu(self, conn, rows):
+        """Validate and upsert menu rows by name in one transaction.
+
+        Returns {'inserted': n, 'updated': n, 'errors': [...]}; invalid rows
+        are reported and skipped, valid ones are still imported.
+        """
+        items, errors = menu_io.validate_rows(rows)
+        inserted, updated = menu_io.upsert_menu(conn, items)
+        return {'inserted': inserted, 'updated': updated, 'errors': errors}
+
+    @timed
+    def export_menu(self, fmt='csv'):
+        """Return all active food items as CSV or JSON text"""
+        with self.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {', '.join(menu_io.MENU_COLUMNS)} FROM food_items
+                WHERE active = 1 ORDER BY category, name
+            ''').fetchall()
+        return menu_io.dump_menu(rows, fmt)
+
+    @transactional
+    def reset_daily_items(self, conn):
+        conn.execute("UPDATE food_items SET stock = 0 WHERE validity_type = 'daily'")
+
+    @timed
+    def archive_orders(self, older_than_days=30, batch_size=archive.BATCH_SIZE):
+        """Move prepared orders older than N days to the archive database.
+
+        Works in batches of short transactions so order placement is never
+        blocked for long; returns the number of orders moved. Batches use
+        their own connection (see database.archive), outside the write
+        queue, and wait for the write lock like another process would.
+        """
+        moved = 0
+        while True:
+            order_ids = archive.move_batch(self.db_path, self.archive_path, older_than_days,
+                                           batch_size, timeout=self.pool.timeout)
+            if not order_ids:
+                return moved
+            moved += len(order_ids)
+
+    @transactional
+    def claim_job(self, conn, name, slot, owner, lease_seconds):
+        """Take the lease to run a scheduled job for slot.
+
+        Returns False if slot has already run or another worker holds an
+        unexpired lease. A job seen for the first time is recorded as done
+        up to slot, so it first runs at its next scheduled time.
+        """
+        conn.execute('INSERT OR IGNORE INTO job_runs (name, last_slot) VALUES (?, ?)',
+                     (name, slot))
+        return conn.execute('''
+            UPDATE job_runs SET lease_owner = ?, lease_expires = datetime('now', ?)
+            WHERE name = ? AND last_slot < ?
+              AND (lease_owner IS NULL OR lease_expires <= CURRENT_TIMESTAMP)
+        ''', (owner, f'+{lease_seconds} seconds', name, slot)).rowcount == 1
+
+    @transactional
+    def finish_job(self, conn, name, owner, result, slot=None):
+        """Release a job lease; pass slot when the run succeeded"""
+        conn.execute('''
+            UPDATE job_runs
+            SET last_slot = COALESCE(?, last_slot), last_result = ?,
+                last_finished = CURRENT_TIMESTAMP, lease_owner = NULL, lease_expires = NULL
+            WHERE name = ? AND lease_owner = ?
+        ''', (slot, result, name, owner))
+
+    @memoized_read
+    def get_job_runs(self):
+        """Scheduled job state, for the admin dashboard"""
+        with self.connection() as conn:
+            return pd.read_sql_query('''
+                SELECT name, last_slot, last_finished, last_result, lease_owner
+                FROM job_runs ORDER BY name
+            ''', conn)
+
+    @memoized_read
+    def get_prep_queue(self):
+        """Total quantity per food item across all active orders, by category.
+
+        Only active orders are read, through the (status, timestamp, order_id)
+        index, so the cost follows the kitchen backlog, not the order history.
+        The age of oldest_order is left to the caller, which may show the
+        result long after this query ran.
+        """
+        placeholders = ','.join('?' * len(ACTIVE_STATUSES))
+        query = f'''
+            SELECT COALESCE(f.category, 'Other') AS category,
+                   oi.item_id,
+                   oi.name,
+                   SUM(oi.quantity) AS quantity,
+                   COUNT(DISTINCT o.order_id) AS orders,
+                   MIN(o.timestamp) AS oldest_order
+            FROM orders o
+            JOIN order_items oi ON oi.order_id = o.order_id
+            LEFT JOIN food_items f ON f.id = oi.item_id
+            WHERE o.status IN ({placeholders})
+            GROUP BY oi.item_id
+            ORDER BY category, oldest_order
+        '''
+        with self.connection() as conn:
+            return pd.read_sql_query(query, conn, params=list(ACTIVE_STATUSES))
+
+    @transactional
+    def rebuild_rollups(self, conn):
+        """Recompute the analytics rollups from the full order history"""
+        rollups.rebuild(conn)
+
+    @memoized_read
     def get_analytics(self):
-        conn = self.get_connection()
-        
-        # Total orders
-        total_orders = pd.read_sql_query(
-            'SELECT COUNT(*) as total FROM orders', conn).iloc[0]['total']
-        
-        # Payment method stats
-        payment_stats = pd.read_sql_query('''
-            SELECT payment_method, COUNT(*) as count 
-            FROM orders GROUP BY payment_method
-        ''', conn)
-        
-        # Most sold items
-        most_sold = pd.read_sql_query('''
-            SELECT items, COUNT(*) as count 
-            FROM orders GROUP BY items 
-            ORDER BY count DESC LIMIT 5
-        ''', conn)
-        
-        conn.close()
-        
+        """Order totals read from the daily rollups, independent of history size"""
+        with self.connection() as conn:
+            # Total orders and revenue
+            totals = conn.execute('''
+                SELECT COALESCE(SUM(orders), 0), COALESCE(SUM(revenue), 0)
+                FROM sales_daily
+            ''').fetchone()
+
+            # Payment method stats
+            payment_stats = pd.read_sql_query('''
+                SELECT payment_method, SUM(orders) as count
+                FROM sales_daily GROUP BY payment_method
+            ''', conn)
+
+            # Orders by current status
+            status_stats = pd.read_sql_query('''
+                SELECT status, SUM(orders) as count
+                FROM status_daily GROUP BY status
+                HAVING SUM(orders) > 0
+            ''', conn)
+
+            # Most sold items by quantity, with the revenue they brought in
+            most_sold = pd.read_sql_query('''
+                SELECT name, SUM(quantity) as quantity, SUM(revenue) as revenue
+                FROM item_sales_daily GROUP BY item_id
+                ORDER BY quantity DESC LIMIT 5
+            ''', conn)
+
         return {
-            'total_orders': total_orders,
+            'total_orders': totals[0],
+            'total_revenue': totals[1],
             'payment_stats': payment_stats,
+            'status_stats': status_stats,
             'most_sold': most_sold
-        }
\ No newline at end of file
+        }
+
+    @memoized_read
+    def get_time_series(self, freq='day', start=None, end=None):
+        """Revenue, orders, basket size and prep time per hour/day/week bucket"""
+        clauses, params = self._order_filters(start=start, end=end)
+        clauses.append(f"status != '{PAYMENT_FAILED}'")
+        with self.connection() as conn:
+            return analytics.time_series(conn, freq, clauses, params)
+
+    @memoized_read
+    def get_peak_hours(self, start=None, end=None):
+        """Orders by hour of day and the peak hour"""
+        clauses, params = self._order_filters(start=start, end=end)
+        clauses.append(f"status != '{PAYMENT_FAILED}'")
+        with self.connection() as conn:
+            return analytics.peak_hours(conn, clauses, params)
+
+    @timed
+    def export_orders(self, path, fmt='csv', start=None, end=None,
+                      chunk_size=export.CHUNK_SIZE):
+        """Stream matching orders to a CSV or Parquet file; returns the row count"""
+        clauses, params = self._order_filters(start=start, end=end)
+        with self.connection() as conn:
+            chunks = export.iter_order_chunks(conn, clauses, params, chunk_size)
+            if fmt == 'parquet':
+                return export.write_parquet(conn, chunks, path)
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                return export.write_csv(chunks, f)
+
+    def performance_stats(self):
+        """Query/method latency summaries, per-rerun counts and the slow-query log"""
+        stats = STATS.dump()
+        stats['menu_cache'] = self.menu_cache_stats()
+        stats['write_queue'] = self.writer.stats() if self.write_queue else None
+        return stats
@@ -0,0 +1,81 @@
+"""Streaming export of the orders table to CSV or Parquet.
+
+Rows are fetched from the cursor in fixed-size chunks and written out as
+they arrive, so memory stays flat however many orders are exported.
+"""
+import csv
+
+try:
+    # Optional: only needed for Parquet export
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+CHUNK_SIZE = 5000
+
+# SQLite declared column types mapped to Arrow types for Parquet
+_ARROW_TYPES = {
+    'INTEGER': 'int64',
+    'REAL': 'float64',
+}
+
+
+def iter_order_chunks(conn, clauses=(), params=(), chunk_size=CHUNK_SIZE):
+    """Yield (columns, rows) for matching orders (archived ones included),
+    oldest first, chunk by chunk"""
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    cursor = conn.execute(f'SELECT * FROM order_history {where} ORDER BY timestamp, order_id',
+                          list(params))
+    columns = [column[0] for column in cursor.description]
+    empty = True
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        empty = False
+        yield columns, rows
+    if empty:
+        # One empty chunk so writers still emit a header
+        yield columns, []
+
+
+def write_csv(chunks, fileobj):
+    """Write chunks to a text file object; returns the number of rows"""
+    writer = csv.writer(fileobj)
+    count = 0
+    header = False
+    for columns, rows in chunks:
+        if not header:
+            writer.writerow(columns)
+            header = True
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+
+def _arrow_schema(conn):
+    # Declared types rather than per-chunk inference, so every row group matches
+    return pa.schema([
+        (row[1], getattr(pa, _ARROW_TYPES.get(row[2].upper(), 'string'))())
+        for row in conn.execute('PRAGMA table_info(order_history)')
+    ])
+
+
+def write_parquet(conn, chunks, path):
+    """Write chunks to a Parquet file, one row group per chunk; returns the row count"""
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = _arrow_schema(conn)
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for columns, rows in chunks:
+            table = pa.Table.from_arrays(
+                [pa.array([row[i] for row in rows], type=schema.field(name).type)
+                 for i, name in enumerate(columns)],
+                names=columns)
+            writer.write_table(table.select(schema.names))
+            count += len(rows)
+    return count
@@ -0,0 +1,228 @@
+"""In-process query and DatabaseManager method timing.
+
+Pooled connections use InstrumentedConnection, whose cursors time every
+statement from execute() through the last fetch. Timings land in the
+process-wide STATS registry as latency histograms keyed by SQL text (or
+method name); statements slower than the threshold are kept in a bounded
+slow-query log. Set CANTEEN_SLOW_QUERY_MS to change the threshold.
+"""
+import bisect
+import collections
+import functools
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from database.cache import active_scope
+
+# Histogram bucket upper bounds in ms: 0.01 ms to ~80 s, 25% apart
+_BOUNDS = [0.01 * 1.25 ** i for i in range(72)]
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with approximate percentiles"""
+
+    __slots__ = ('counts', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(_BOUNDS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (q in 0-100)"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(_BOUNDS[i], self.max_ms) if i < len(_BOUNDS) else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        return {
+            'calls': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(self.max_ms, 3),
+        }
+
+
+class QueryStats:
+    """Thread-safe registry of query, method and per-rerun statistics"""
+
+    def __init__(self, slow_threshold_ms=None, slow_log_size=200):
+        if slow_threshold_ms is None:
+            slow_threshold_ms = float(os.environ.get('CANTEEN_SLOW_QUERY_MS', 100))
+        self.slow_threshold_ms = slow_threshold_ms
+        self._lock = threading.Lock()
+        self._queries = collections.defaultdict(LatencyHistogram)
+        self._methods = collections.defaultdict(LatencyHistogram)
+        self._rerun_statements = collections.deque(maxlen=1000)
+        self._slow = collections.deque(maxlen=slow_log_size)
+
+    def record_query(self, sql, ms):
+        sql = normalize_sql(sql)
+        with self._lock:
+            self._queries[sql].add(ms)
+            if ms >= self.slow_threshold_ms:
+                self._slow.append({
+                    'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'ms': round(ms, 3),
+                    'sql': sql,
+                })
+
+    def record_method(self, name, ms):
+        with self._lock:
+            self._methods[name].add(ms)
+
+    def record_rerun(self, scope):
+        """Record how many statements one script run issued"""
+        with self._lock:
+            self._rerun_statements.append(scope.statements)
+
+    def top(self, kind='queries', by='total_ms', limit=10):
+        """Rows of summary dicts for the slowest queries or methods"""
+        with self._lock:
+            source = self._queries if kind == 'queries' else self._methods
+            rows = [{'name': name, **hist.summary()} for name, hist in source.items()]
+        return sorted(rows, key=lambda row: row[by], reverse=True)[:limit]
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reruns(self):
+        """Statements per script run over the last 1,000 runs"""
+        with self._lock:
+            counts = sorted(self._rerun_statements)
+        if not counts:
+            return {'reruns': 0, 'mean_statements': 0.0, 'p99_statements': 0, 'max_statements': 0}
+        return {
+            'reruns': len(counts),
+            'mean_statements': round(sum(counts) / len(counts), 2),
+            'p99_statements': counts[min(len(counts) - 1, int(len(counts) * 0.99))],
+            'max_statements': counts[-1],
+        }
+
+    def dump(self):
+        """Everything collected so far, as a JSON-serializable dict"""
+        return {
+            'slow_threshold_ms': self.slow_threshold_ms,
+            'queries': self.top('queries', limit=None),
+            'methods': self.top('methods', limit=None),
+            'reruns': self.reruns(),
+            'slow_queries': self.slow_queries(),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._methods.clear()
+            self._rerun_statements.clear()
+            self._slow.clear()
+
+
+STATS = QueryStats()
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that times each statement from execute() through its last fetch"""
+
+    _sql = None
+    _elapsed = 0.0
+
+    def _flush(self):
+        if self._sql is not None:
+            STATS.record_query(self._sql, self._elapsed * 1000)
+            self._sql = None
+
+    def _timed(self, call, sql, *args):
+        self._flush()
+        scope = active_scope.get()
+        if scope is not None:
+            scope.statements += 1
+        start = time.perf_counter()
+        try:
+            return call(sql, *args)
+        finally:
+            self._sql = sql
+            self._elapsed = time.perf_counter() - start
+
+    def _timed_fetch(self, call, *args):
+        start = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def execute(self, sql, *args):
+        return self._timed(super().execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._timed(super().executemany, sql, *args)
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed_fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+    def __next__(self):
+        return self._timed_fetch(super().__next__)
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def __del__(self):
+        self._flush()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute) are TimedCursors"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The C implementations bypass cursor(), so route the shortcuts through it
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+
+def timed(method):
+    """Record the wall time of a DatabaseManager method under its name"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            STATS.record_method(method.__name__, (time.perf_counter() - start) * 1000)
+    return wrapper
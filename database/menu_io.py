@@ -0,0 +1,107 @@
+"""Bulk menu import/export (CSV or JSON).
+
+Files hold one row per food item with the columns in MENU_COLUMNS.
+Imports upsert by item name: an existing item is updated (and re-activated),
+new names are inserted. Where several rows share a name (an item deleted
+and later re-added), only the active one, or else the newest, is updated.
+"""
+import csv
+import io
+import json
+import math
+
+MENU_COLUMNS = ['name', 'price', 'category', 'stock', 'validity_type']
+CATEGORIES = ['Breakfast', 'Lunch', 'Snacks', 'Beverages']
+VALIDITY_TYPES = ['daily', 'regular']
+
+
+def parse_menu_file(data, fmt):
+    """Parse uploaded bytes into a list of row dicts"""
+    text = data.decode('utf-8-sig') if isinstance(data, bytes) else data
+    if fmt == 'json':
+        rows = json.loads(text)
+        if not isinstance(rows, list):
+            raise ValueError("JSON menu must be a list of objects")
+        return rows
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def validate_rows(rows):
+    """Split rows into clean (name, price, category, stock, validity_type)
+    tuples and a list of {'row': n, 'name': ..., 'error': ...} problems.
+
+    Row numbers are 1-based over the data rows; a later row with the same
+    name replaces an earlier one.
+    """
+    valid = {}
+    errors = []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': number, 'name': '', 'error': 'not an object'})
+            continue
+
+        name = str(row.get('name') or '').strip()
+        category = str(row.get('category') or '').strip()
+        validity_type = str(row.get('validity_type') or 'regular').strip().lower()
+        try:
+            price = float(row.get('price'))
+            stock = float(row.get('stock') or 0)
+            if not math.isfinite(price):
+                # nan would slip past the sign check and fail NOT NULL on insert
+                raise ValueError(price)
+        except (TypeError, ValueError, OverflowError):
+            price, stock = None, None
+
+        if not name:
+            error = "name is required"
+        elif price is None:
+            error = "price and stock must be numbers"
+        elif price < 0 or stock < 0:
+            error = "price and stock must not be negative"
+        elif not stock.is_integer():
+            error = "stock must be a whole number"
+        elif category not in CATEGORIES:
+            error = f"category must be one of {', '.join(CATEGORIES)}"
+        elif validity_type not in VALIDITY_TYPES:
+            error = f"validity_type must be one of {', '.join(VALIDITY_TYPES)}"
+        else:
+            error = None
+
+        if error:
+            errors.append({'row': number, 'name': name, 'error': error})
+            continue
+
+        valid[name] = (name, price, category, int(stock), validity_type)
+
+    return list(valid.values()), errors
+
+
+def upsert_menu(conn, items):
+    """Update existing items by name and insert the rest; returns (inserted, updated)"""
+    # Later rows win: the active row for a name, else the newest
+    existing = dict(conn.execute('SELECT name, id FROM food_items ORDER BY active, id'))
+    updates = [(price, category, stock, validity_type, existing[name])
+               for name, price, category, stock, validity_type in items if name in existing]
+    inserts = [item for item in items if item[0] not in existing]
+
+    conn.executemany('''
+        UPDATE food_items
+        SET price = ?, category = ?, stock = ?, validity_type = ?, active = 1
+        WHERE id = ?
+    ''', updates)
+    conn.executemany('''
+        INSERT INTO food_items (name, price, category, stock, validity_type)
+        VALUES (?, ?, ?, ?, ?)
+    ''', inserts)
+    return len(inserts), len(updates)
+
+
+def dump_menu(rows, fmt):
+    """Serialize (name, price, category, stock, validity_type) rows to CSV or JSON text"""
+    if fmt == 'json':
+        return json.dumps([dict(zip(MENU_COLUMNS, row)) for row in rows], indent=2)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(MENU_COLUMNS)
+    writer.writerows(rows)
+    return out.getvalue()
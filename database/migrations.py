@@ -0,0 +1,312 @@
+"""Versioned schema migrations.
+
+Each migration is a (version, description, function) entry; the function
+receives a cursor inside the migration transaction. Append new migrations
+to MIGRATIONS with the next version number and never edit applied ones.
+"""
+import sqlite3
+
+from database import rollups
+
+# UPSERT ... RETURNING (order IDs, stock holds) needs 3.35; UPDATE ... FROM
+# (migration 7) needs 3.33
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+
+def _base_schema(c):
+    # Create users table
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL
+        )
+    ''')
+
+    # Create food_items table
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS food_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            category TEXT NOT NULL,
+            stock INTEGER NOT NULL,
+            validity_type TEXT NOT NULL,
+            active BOOLEAN DEFAULT 1
+        )
+    ''')
+
+    # Create orders table
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            items TEXT NOT NULL,
+            total_amount REAL NOT NULL,
+            payment_method TEXT NOT NULL,
+            payment_id TEXT,
+            status TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (username) REFERENCES users(username)
+        )
+    ''')
+
+    # Insert default users if not exists
+    default_users = [
+        ('admin', 'admin123', 'admin'),
+        ('staff', 'staff123', 'staff'),
+        ('student1', 'stu123', 'student')
+    ]
+    c.executemany(
+        'INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)',
+        default_users)
+
+
+def _counters(c):
+    # Named monotonic sequences, e.g. per-day order numbers
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+
+
+def _order_items(c):
+    # One row per cart line, mirrors orders.items
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS order_items (
+            order_id TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            unit_price REAL NOT NULL,
+            quantity INTEGER NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES orders(order_id)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_order_items_item ON order_items(item_id)')
+
+    # Backfill from the JSON blobs of orders that predate the table
+    c.execute('''
+        INSERT INTO order_items (order_id, item_id, name, unit_price, quantity)
+        SELECT o.order_id,
+               json_extract(line.value, '$.id'),
+               json_extract(line.value, '$.name'),
+               json_extract(line.value, '$.price'),
+               json_extract(line.value, '$.quantity')
+        FROM orders o, json_each(o.items) AS line
+        WHERE NOT EXISTS (
+            SELECT 1 FROM order_items oi WHERE oi.order_id = o.order_id
+        )
+    ''')
+
+
+def _hot_query_indexes(c):
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_user_time ON orders(username, timestamp)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_status_time ON orders(status, timestamp)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_food_items_active_category ON food_items(active, category)')
+
+
+def _menu_version(c):
+    # Bump the 'menu' counter on any food_items change so menu caches refetch
+    c.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('menu', 0)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS food_items_menu_version_{event.lower()}
+            AFTER {event} ON food_items
+            BEGIN
+                UPDATE counters SET value = value + 1 WHERE name = 'menu';
+            END
+        ''')
+
+
+def _keyset_indexes(c):
+    # Cover the (timestamp, order_id) keyset used for paging order lists
+    c.execute('DROP INDEX IF EXISTS idx_orders_user_time')
+    c.execute('DROP INDEX IF EXISTS idx_orders_status_time')
+    c.execute('CREATE INDEX idx_orders_user_time ON orders(username, timestamp, order_id)')
+    c.execute('CREATE INDEX idx_orders_status_time ON orders(status, timestamp, order_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_time ON orders(timestamp, order_id)')
+
+
+def _order_change_seq(c):
+    # Monotonic change sequence, bumped whenever an order is created or updated
+    c.execute('ALTER TABLE orders ADD COLUMN change_seq INTEGER')
+    c.execute('''
+        UPDATE orders SET change_seq = ranked.seq
+        FROM (
+            SELECT order_id, ROW_NUMBER() OVER (ORDER BY timestamp, order_id) AS seq
+            FROM orders
+        ) AS ranked
+        WHERE ranked.order_id = orders.order_id
+    ''')
+    c.execute('''
+        INSERT INTO counters (name, value)
+        SELECT 'order_changes', COALESCE(MAX(change_seq), 0) FROM orders
+    ''')
+    c.execute('CREATE INDEX idx_orders_change_seq ON orders(change_seq)')
+
+
+def _analytics_rollups(c):
+    rollups.create_tables(c)
+    rollups.rebuild(c, include_archive=False)
+
+
+def _prepared_at(c):
+    # When an order was marked prepared, for order-to-prepared latency
+    c.execute('ALTER TABLE orders ADD COLUMN prepared_at DATETIME')
+
+
+def _food_item_name_index(c):
+    # Bulk menu import matches items by name
+    c.execute('CREATE INDEX IF NOT EXISTS idx_food_items_name ON food_items(name)')
+
+
+def _payment_id_index(c):
+    # Payment reconciliation matches gateway settlements by payment_id
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_payment_id ON orders(payment_id)')
+
+
+def _menu_page_index(c):
+    # Menu pages filter active items by category and sort by name; this
+    # index covers that order and replaces the (active, category) index
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_food_items_active_category_name
+        ON food_items(active, category, name)
+    ''')
+    c.execute('DROP INDEX IF EXISTS idx_food_items_active_category')
+
+
+def _menu_search(c):
+    # Full-text index of active food items, rowid = food_items.id. Triggers
+    # keep it in sync; soft-deleted (active = 0) items drop out of it.
+    c.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS food_items_fts USING fts5(
+            name, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS food_items_fts_insert
+        AFTER INSERT ON food_items WHEN new.active = 1
+        BEGIN
+            INSERT INTO food_items_fts (rowid, name, category)
+            VALUES (new.id, new.name, new.category);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS food_items_fts_update
+        AFTER UPDATE OF name, category, active ON food_items
+        BEGIN
+            DELETE FROM food_items_fts WHERE rowid = old.id;
+            INSERT INTO food_items_fts (rowid, name, category)
+            SELECT new.id, new.name, new.category WHERE new.active = 1;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS food_items_fts_delete
+        AFTER DELETE ON food_items
+        BEGIN
+            DELETE FROM food_items_fts WHERE rowid = old.id;
+        END
+    ''')
+    c.execute('DELETE FROM food_items_fts')
+    c.execute('''
+        INSERT INTO food_items_fts (rowid, name, category)
+        SELECT id, name, category FROM food_items WHERE active = 1
+    ''')
+
+
+def _stock_holds(c):
+    # Short-lived cart reservations; available stock = stock - unexpired holds
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS stock_holds (
+            hold_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            expires_at DATETIME NOT NULL
+        )
+    ''')
+    # Covers SUM(quantity) of an item's unexpired holds
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_stock_holds_item
+        ON stock_holds(item_id, expires_at, quantity)
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_stock_holds_user ON stock_holds(username)')
+
+
+def _job_runs(c):
+    # Scheduler state: last completed slot and the lease of the running worker
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS job_runs (
+            name TEXT PRIMARY KEY,
+            last_slot TEXT NOT NULL,
+            last_finished DATETIME,
+            last_result TEXT,
+            lease_owner TEXT,
+            lease_expires DATETIME
+        )
+    ''')
+
+
+def _payment_error(c):
+    # Why an online payment failed; kept out of the indexed payment_id
+    c.execute('ALTER TABLE orders ADD COLUMN payment_error TEXT')
+
+
+MIGRATIONS = [
+    (1, 'Base schema and default users', _base_schema),
+    (2, 'Counters table', _counters),
+    (3, 'Normalized order_items table', _order_items),
+    (4, 'Indexes for hot order and menu queries', _hot_query_indexes),
+    (5, 'Menu version counter triggers', _menu_version),
+    (6, 'Keyset pagination indexes on orders', _keyset_indexes),
+    (7, 'Order change sequence', _order_change_seq),
+    (8, 'Analytics rollup tables', _analytics_rollups),
+    (9, 'Order prepared_at timestamp', _prepared_at),
+    (10, 'Index on food item names', _food_item_name_index),
+    (11, 'Index on order payment IDs', _payment_id_index),
+    (12, 'Menu pagination index', _menu_page_index),
+    (13, 'Full-text menu search', _menu_search),
+    (14, 'Cart stock holds', _stock_holds),
+    (15, 'Scheduled job runs', _job_runs),
+    (16, 'Payment failure reasons', _payment_error),
+]
+
+
+def migrate(conn):
+    """Apply pending migrations in one transaction; returns the new version.
+
+    BEGIN IMMEDIATE takes the write lock before the version check, so
+    concurrent workers starting together apply each migration once.
+    Raises RuntimeError if the SQLite library is older than MIN_SQLITE_VERSION.
+    """
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        raise RuntimeError(
+            f"SQLite {'.'.join(map(str, MIN_SQLITE_VERSION))} or newer is required; "
+            f"Python is linked against {sqlite3.sqlite_version}")
+    c = conn.cursor()
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        current = c.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+        for version, description, apply in MIGRATIONS:
+            if version <= current:
+                continue
+            apply(c)
+            c.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                     (version, description))
+            current = version
+    except BaseException:
+        c.execute('ROLLBACK')
+        raise
+    c.execute('COMMIT')
+    return current
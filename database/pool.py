@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+from database import archive
+from database.instrumentation import InstrumentedConnection
+
+# Pragmas applied to every pooled connection
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA cache_size = -16000',  # ~16 MB page cache per connection
+    'PRAGMA temp_store = MEMORY',
+)
+
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections for one database file.
+
+    With archive_path, every connection also attaches the order archive
+    (see database.archive).
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, db_path, max_size=8, timeout=10.0, archive_path=None):
+        self.db_path = db_path
+        self.archive_path = archive_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @classmethod
+    def for_path(cls, db_path, **kwargs):
+        """Return the process-wide pool for db_path, creating it on first use"""
+        with cls._pools_lock:
+            pool = cls._pools.get(db_path)
+            # SQLite connections must not cross fork(): a child gets a fresh
+            # pool and leaves the inherited connections alone
+            if pool is None or pool._pid != os.getpid():
+                pool = cls(db_path, **kwargs)
+                cls._pools[db_path] = pool
+            return pool
+
+    def _connect(self):
+        # Autocommit mode: transactions are opened explicitly by the caller
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            factory=InstrumentedConnection
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if self.archive_path:
+            archive.attach(conn, self.archive_path)
+        return conn
+
+    def acquire(self):
+        """Take an idle connection, opening a new one while under max_size"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._size < self.max_size:
+                self._size += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Timed out waiting for a connection to {self.db_path}")
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._size -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close every idle connection in the pool"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
@@ -0,0 +1,142 @@
+"""Incrementally maintained analytics rollups.
+
+sales_daily, item_sales_daily and status_daily are updated in the same
+transaction as order creation and status changes, so analytics read a few
+rows per day instead of scanning the order history. Rebuild them from
+scratch (e.g. after a manual data fix) with:
+
+    python -m database.rollups [--db database/canteen.db]
+"""
+import argparse
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        day TEXT NOT NULL,
+        payment_method TEXT NOT NULL,
+        orders INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        PRIMARY KEY (day, payment_method)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS item_sales_daily (
+        day TEXT NOT NULL,
+        item_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        PRIMARY KEY (day, item_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS status_daily (
+        day TEXT NOT NULL,
+        status TEXT NOT NULL,
+        orders INTEGER NOT NULL,
+        PRIMARY KEY (day, status)
+    )
+    ''',
+)
+
+# Each statement aggregates the orders matched by {where} and adds the
+# result onto the existing rollup rows ({sign} '-' subtracts it instead).
+# {orders}/{order_items} are the hot tables, or the history views that
+# include archived orders.
+_SALES = '''
+    INSERT INTO sales_daily (day, payment_method, orders, revenue)
+    SELECT date(timestamp), payment_method, {sign}COUNT(*), {sign}SUM(total_amount)
+    FROM {orders} {where}
+    GROUP BY date(timestamp), payment_method
+    ON CONFLICT (day, payment_method) DO UPDATE SET
+        orders = orders + excluded.orders,
+        revenue = revenue + excluded.revenue
+'''
+
+_ITEM_SALES = '''
+    INSERT INTO item_sales_daily (day, item_id, name, quantity, revenue)
+    SELECT date(o.timestamp), oi.item_id, oi.name,
+           {sign}SUM(oi.quantity), {sign}SUM(oi.unit_price * oi.quantity)
+    FROM {orders} o JOIN {order_items} oi ON oi.order_id = o.order_id
+    {where}
+    GROUP BY date(o.timestamp), oi.item_id
+    ON CONFLICT (day, item_id) DO UPDATE SET
+        name = excluded.name,
+        quantity = quantity + excluded.quantity,
+        revenue = revenue + excluded.revenue
+'''
+
+_STATUS = '''
+    INSERT INTO status_daily (day, status, orders)
+    SELECT date(timestamp), status, COUNT(*)
+    FROM {orders} {where}
+    GROUP BY date(timestamp), status
+    ON CONFLICT (day, status) DO UPDATE SET
+        orders = orders + excluded.orders
+'''
+
+
+def create_tables(c):
+    for statement in SCHEMA:
+        c.execute(statement)
+
+
+def record_order(conn, order_id):
+    """Add a newly inserted order to every rollup"""
+    tables = {'orders': 'orders', 'order_items': 'order_items'}
+    conn.execute(_SALES.format(where='WHERE order_id = ?', sign='', **tables), (order_id,))
+    conn.execute(_ITEM_SALES.format(where='WHERE o.order_id = ?', sign='', **tables), (order_id,))
+    conn.execute(_STATUS.format(where='WHERE order_id = ?', **tables), (order_id,))
+
+
+def remove_sales(conn, order_id):
+    """Take an order back out of the sales rollups (e.g. its payment failed)"""
+    tables = {'orders': 'orders', 'order_items': 'order_items'}
+    conn.execute(_SALES.format(where='WHERE order_id = ?', sign='-', **tables), (order_id,))
+    conn.execute(_ITEM_SALES.format(where='WHERE o.order_id = ?', sign='-', **tables), (order_id,))
+
+
+def record_status_change(conn, order_id, old_status, new_status):
+    """Move an order between status buckets of the day it was placed"""
+    day = conn.execute('SELECT date(timestamp) FROM orders WHERE order_id = ?',
+                       (order_id,)).fetchone()[0]
+    conn.execute('UPDATE status_daily SET orders = orders - 1 WHERE day = ? AND status = ?',
+                 (day, old_status))
+    conn.execute('''
+        INSERT INTO status_daily (day, status, orders) VALUES (?, ?, 1)
+        ON CONFLICT (day, status) DO UPDATE SET orders = orders + 1
+    ''', (day, new_status))
+
+
+def rebuild(conn, include_archive=True):
+    """Recompute every rollup from all orders, archived ones included.
+
+    include_archive=False reads only the hot tables (for schema migrations
+    that run before the history views can resolve).
+    """
+    for table in ('sales_daily', 'item_sales_daily', 'status_daily'):
+        conn.execute(f'DELETE FROM {table}')
+    if include_archive:
+        tables = {'orders': 'order_history', 'order_items': 'order_item_history'}
+    else:
+        tables = {'orders': 'orders', 'order_items': 'order_items'}
+    # The WHERE clause also keeps INSERT ... SELECT ... ON CONFLICT
+    # unambiguous to the parser; failed payments never count as sales
+    conn.execute(_SALES.format(where="WHERE status != 'payment_failed'", sign='', **tables))
+    conn.execute(_ITEM_SALES.format(where="WHERE o.status != 'payment_failed'", sign='',
+                                    **tables))
+    conn.execute(_STATUS.format(where='WHERE true', **tables))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild analytics rollup tables')
+    parser.add_argument('--db', default='database/canteen.db')
+    args = parser.parse_args()
+
+    from database.db_utils import DatabaseManager
+    DatabaseManager(args.db).rebuild_rollups()
+    print(f"Rebuilt analytics rollups in {args.db}")
+
+
+if __name__ == '__main__':
+    main()
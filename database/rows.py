@@ -0,0 +1,48 @@
+"""Compact row objects returned by the hot DatabaseManager reads.
+
+The UI renders menus, orders and user lists on every rerun; plain
+__slots__ objects built straight from cursor tuples avoid the DataFrame
+construction and per-row Series of iterrows(). DataFrames remain the
+return type for analytics and export.
+"""
+
+
+class Row:
+    """Base class: one attribute per column, in the order of __slots__"""
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def columns(cls, alias=None):
+        """SELECT list matching __slots__, optionally qualified by a table alias"""
+        prefix = f'{alias}.' if alias else ''
+        return ', '.join(prefix + name for name in cls.__slots__)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class MenuItem(Row):
+    __slots__ = ('id', 'name', 'price', 'category', 'stock', 'validity_type', 'active')
+
+
+class Order(Row):
+    """An order; items holds the decoded cart lines"""
+
+    __slots__ = ('order_id', 'username', 'items', 'total_amount', 'payment_method',
+                 'payment_id', 'status', 'timestamp', 'change_seq', 'prepared_at')
+
+
+class User(Row):
+    __slots__ = ('username', 'role')
@@ -0,0 +1,109 @@
+"""In-process scheduler for daily maintenance jobs.
+
+Each job runs once a day at a fixed local time. Job state lives in the
+job_runs table: a worker must win a lease on the job's row before running
+it, so when several app processes each start a Scheduler only one of them
+runs a given slot. A slot that was missed (the app was down, or the run
+failed) is caught up at the next poll; missed days collapse into one run,
+which is enough for these idempotent jobs.
+
+Configured by environment variables:
+    CANTEEN_DAILY_RESET_AT      local time daily stock is reset (default 05:00)
+    CANTEEN_ARCHIVE_AT          local time orders are archived (default 03:00)
+    CANTEEN_ARCHIVE_AFTER_DAYS  archive prepared orders older than this (default 30)
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+log = logging.getLogger(__name__)
+
+POLL_SECONDS = 60
+
+# A worker that dies mid-run gives the job up after this long
+LEASE_SECONDS = 900
+
+
+class DailyJob:
+    """A callable run once a day at a local time of day"""
+
+    def __init__(self, name, at, action):
+        self.name = name
+        self.at = at
+        self.action = action
+
+    def latest_slot(self, now):
+        """The most recent scheduled run time at or before now"""
+        slot = datetime.combine(now.date(), self.at)
+        return slot if slot <= now else slot - timedelta(days=1)
+
+
+def parse_time(value):
+    """'HH:MM' -> datetime.time"""
+    return datetime.strptime(value, '%H:%M').time()
+
+
+def default_jobs(db):
+    """The daily stock reset and order archival, configured from the environment"""
+    archive_after_days = int(os.environ.get('CANTEEN_ARCHIVE_AFTER_DAYS', 30))
+    return [
+        DailyJob('reset_daily_items',
+                 parse_time(os.environ.get('CANTEEN_DAILY_RESET_AT', '05:00')),
+                 db.reset_daily_items),
+        DailyJob('archive_orders',
+                 parse_time(os.environ.get('CANTEEN_ARCHIVE_AT', '03:00')),
+                 lambda: f"{db.archive_orders(archive_after_days)} orders archived"),
+    ]
+
+
+class Scheduler:
+    """Polls the jobs on a daemon thread and runs the ones that are due"""
+
+    def __init__(self, db, jobs, poll_seconds=POLL_SECONDS):
+        self.db = db
+        self.jobs = jobs
+        self.poll_seconds = poll_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def run_pending(self, now=None):
+        """Run every job whose latest slot has not completed; returns their names"""
+        now = now or datetime.now()
+        ran = []
+        for job in self.jobs:
+            slot = job.latest_slot(now).isoformat(sep=' ', timespec='minutes')
+            if not self.db.claim_job(job.name, slot, self.owner, LEASE_SECONDS):
+                continue
+            try:
+                result = job.action()
+            except Exception as e:
+                # Lease released without the slot: retried at the next poll
+                log.exception("Scheduled job %s failed", job.name)
+                self.db.finish_job(job.name, self.owner, f"failed: {e!r}")
+                continue
+            self.db.finish_job(job.name, self.owner, str(result or 'ok'), slot=slot)
+            ran.append(job.name)
+        return ran
+
+    def _run(self):
+        while True:
+            try:
+                self.run_pending()
+            except Exception:
+                log.exception("Scheduler poll failed")
+            if self._stop.wait(self.poll_seconds):
+                return
@@ -0,0 +1,195 @@
+"""Single-writer queue with group commit.
+
+SQLite allows one writer at a time. By default every DatabaseManager write
+opens its own BEGIN IMMEDIATE transaction from the calling thread, so under
+load the Streamlit threads queue up on the file lock (and give up with
+`database is locked` after busy_timeout), each paying for its own commit.
+
+In write-queue mode (CANTEEN_WRITE_QUEUE=1) writes are instead submitted to
+the process-wide WriteQueue for the database file. Its writer thread takes
+the first waiting write, gathers whatever else arrives within max_latency
+(up to max_batch writes) and applies them in one transaction, each inside
+its own SAVEPOINT: a write that raises is rolled back on its own and its
+caller gets the exception, while the rest of the batch still commits.
+Callers block on a Future that resolves only after the batch has
+committed, for up to RESULT_TIMEOUT seconds.
+
+Writes from other processes still contend for the lock as before; one
+queue serializes the writes of one process.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+log = logging.getLogger(__name__)
+
+# Longest the first write of a batch waits for others to share its commit
+MAX_LATENCY = 0.002
+
+MAX_BATCH = 64
+
+# Longest run() waits for a write's batch to commit
+RESULT_TIMEOUT = 30.0
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Applies submitted writes on one thread in batched transactions"""
+
+    _queues = {}
+    _queues_lock = threading.Lock()
+
+    def __init__(self, pool, max_batch=MAX_BATCH, max_latency=MAX_LATENCY):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self._pending = queue.SimpleQueue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+        self.failed_batches = 0
+        self.largest_batch = 0
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def for_pool(cls, pool, **kwargs):
+        """Return the process-wide queue for the pool's database, starting it on first use"""
+        with cls._queues_lock:
+            writer = cls._queues.get(pool.db_path)
+            # A forked child inherits the registry but not the writer thread
+            if writer is None or writer._pid != os.getpid():
+                writer = cls(pool, **kwargs)
+                cls._queues[pool.db_path] = writer
+            return writer
+
+    def submit(self, func):
+        """Queue func(conn) to run in a write transaction; returns a Future of its result"""
+        if threading.current_thread() is self._thread:
+            # The writer would wait on itself
+            raise RuntimeError("Cannot queue a write from inside another queued write")
+        future = Future()
+        with self._lock:
+            if self._closed or not self._thread.is_alive():
+                raise RuntimeError(f"Write queue for {self.pool.db_path} is closed")
+            self._pending.put((future, func))
+        return future
+
+    def run(self, func, timeout=RESULT_TIMEOUT):
+        """Queue func(conn) and wait up to timeout seconds for its result.
+
+        A write still waiting in the queue at the timeout is withdrawn and
+        raises sqlite3.OperationalError, like a lock timeout; one already
+        being applied may yet commit, so it raises TimeoutError instead.
+        """
+        future = self.submit(func)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise sqlite3.OperationalError(
+                    f"Timed out waiting for the write queue of {self.pool.db_path}") from None
+            if future.done():
+                # Finished just now, or func itself raised TimeoutError
+                return future.result()
+            raise TimeoutError(
+                f"Write to {self.pool.db_path} did not commit within {timeout} s") from None
+
+    def close(self):
+        """Apply the writes already queued, then stop the writer thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        """Batch counters, for the admin dashboard"""
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'writes': self.writes,
+                'failed_batches': self.failed_batches,
+                'mean_batch': round(self.writes / self.batches, 2) if self.batches else 0.0,
+                'largest_batch': self.largest_batch,
+            }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._pending.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.max_batch:
+                try:
+                    op = self._pending.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if op is _STOP:
+                    stopping = True
+                    break
+                batch.append(op)
+            try:
+                self._apply(batch)
+            except BaseException as e:
+                # Keep the writer alive; whoever is still waiting gets the error
+                log.exception("Write queue failed to apply a batch")
+                for future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _apply(self, batch):
+        # Cancelled futures are dropped; the rest are marked running
+        batch = [(future, func) for future, func in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        outcomes = []
+        try:
+            with self.pool.connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    for future, func in batch:
+                        conn.execute('SAVEPOINT queued_write')
+                        try:
+                            outcomes.append((future, func(conn), None))
+                        except BaseException as e:
+                            # Anything a write raises, SystemExit included,
+                            # goes to its caller rather than ending the thread
+                            conn.execute('ROLLBACK TO queued_write')
+                            outcomes.append((future, None, e))
+                        conn.execute('RELEASE queued_write')
+                except BaseException:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    raise
+                conn.execute('COMMIT')
+        except BaseException as e:
+            # BEGIN or COMMIT failed (e.g. locked by another process): nothing
+            # in the batch was written
+            log.exception("Write batch of %d failed", len(batch))
+            with self._lock:
+                self.failed_batches += 1
+            for future, _ in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.writes += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
@@ -1,13 +1,115 @@
-import razorpay
+import abc
 import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
-class PaymentManager:
+try:
+    import razorpay
+except ImportError:
+    razorpay = None
+
+log = logging.getLogger(__name__)
+
+
+class PaymentError(Exception):
+    """Permanent payment failure (e.g. card declined); not retried"""
+
+
+class PaymentGateway(abc.ABC):
+    """Interface for payment gateways used by PaymentProcessor.
+
+    capture() must be idempotent per idempotency_key: calling it again with
+    the same key returns the original payment instead of charging twice.
+    Raise PaymentError for permanent failures; transient failures
+    (TimeoutError, ConnectionError) are retried.
+    """
+
+    @abc.abstractmethod
+    def capture(self, amount, idempotency_key):
+        """Charge amount and return the gateway payment_id"""
+
+    @abc.abstractmethod
+    def list_settlements(self, start, end, cursor=None, page_size=500):
+        """One page of captures with start <= captured_at < end.
+
+        Returns (rows, next_cursor): rows are dicts with payment_id, amount,
+        reference (the idempotency key) and captured_at, oldest first;
+        next_cursor is None after the last page.
+        """
+
+
+def _page_captures(captures, start, end, cursor, page_size):
+    # Keyset paging over (captured_at, payment_id), like the order history
+    rows = sorted(
+        (row for row in captures
+         if str(start) <= row['captured_at'] < str(end)
+         and (cursor is None or (row['captured_at'], row['payment_id']) > tuple(cursor))),
+        key=lambda row: (row['captured_at'], row['payment_id']))
+    page = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        next_cursor = (page[-1]['captured_at'], page[-1]['payment_id'])
+    return page, next_cursor
+
+
+class FakeGateway(PaymentGateway):
+    """Local stand-in gateway with configurable latency and failure rates"""
+
+    def __init__(self, latency=0.2, failure_rate=0.0, decline_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.captures = {}
+        self.calls = 0
+
+    def capture(self, amount, idempotency_key):
+        with self._lock:
+            self.calls += 1
+            if idempotency_key in self.captures:
+                return self.captures[idempotency_key]['payment_id']
+            roll = self._rng.random()
+
+        time.sleep(self.latency)
+        if roll < self.failure_rate:
+            raise ConnectionError("fake gateway: transient failure")
+        if roll < self.failure_rate + self.decline_rate:
+            raise PaymentError("fake gateway: payment declined")
+
+        with self._lock:
+            # A concurrent retry with the same key may have finished first
+            capture = self.captures.setdefault(idempotency_key, {
+                'payment_id': f"pay_{uuid.uuid4().hex[:14]}",
+                'amount': amount,
+                'reference': idempotency_key,
+                # UTC, like the CURRENT_TIMESTAMP order timestamps
+                'captured_at': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
+            })
+            return capture['payment_id']
+
+    def list_settlements(self, start, end, cursor=None, page_size=500):
+        with self._lock:
+            captures = list(self.captures.values())
+        return _page_captures(captures, start, end, cursor, page_size)
+
+
+class PaymentManager(PaymentGateway):
     def __init__(self):
         # Test mode credentials
-        self.client = razorpay.Client(
-            auth=("rzp_test_key", "rzp_test_secret")
-        )
-    
+        self.client = None
+        if razorpay is not None:
+            self.client = razorpay.Client(
+                auth=("rzp_test_key", "rzp_test_secret")
+            )
+        self._captures = {}
+        self._lock = threading.Lock()
+
     def create_order(self, amount, currency="INR"):
         """Create a Razorpay order"""
         try:
@@ -20,7 +122,7 @@ class PaymentManager:
             }
         except Exception as e:
             return None
-    
+
     def verify_payment(self, payment_id, order_id, signature):
         """Verify Razorpay payment signature"""
         try:
@@ -28,12 +130,120 @@ class PaymentManager:
             return True
         except Exception as e:
             return False
-    
+
     def process_payment(self, amount):
         """Process payment and return demo success response"""
         return {
             'status': 'success',
-            'payment_id': 'pay_demo123',
+            'payment_id': f"pay_demo{uuid.uuid4().hex[:14]}",
             'order_id': 'order_demo123',
             'signature': 'sig_demo123'
-        }
\ No newline at end of file
+        }
+
+    def capture(self, amount, idempotency_key):
+        """Gateway interface: demo capture, idempotent per key"""
+        with self._lock:
+            if idempotency_key in self._captures:
+                return self._captures[idempotency_key]['payment_id']
+
+        # The gateway call runs unlocked so workers capture in parallel
+        response = self.process_payment(amount)
+        if response['status'] != 'success':
+            raise PaymentError(json.dumps(response))
+
+        with self._lock:
+            # A concurrent retry with the same key may have finished first
+            capture = self._captures.setdefault(idempotency_key, {
+                'payment_id': response['payment_id'],
+                'amount': amount,
+                'reference': idempotency_key,
+                'captured_at': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
+            })
+            return capture['payment_id']
+
+    def list_settlements(self, start, end, cursor=None, page_size=500):
+        """Gateway interface: demo captures made by this process"""
+        with self._lock:
+            captures = list(self._captures.values())
+        return _page_captures(captures, start, end, cursor, page_size)
+
+
+def make_gateway():
+    """Gateway selected by CANTEEN_PAYMENT_GATEWAY ('razorpay' or 'fake')"""
+    if os.environ.get('CANTEEN_PAYMENT_GATEWAY', 'razorpay') == 'fake':
+        return FakeGateway(
+            latency=float(os.environ.get('CANTEEN_FAKE_GATEWAY_LATENCY', 0.5)),
+            failure_rate=float(os.environ.get('CANTEEN_FAKE_GATEWAY_FAILURE_RATE', 0.0)),
+            decline_rate=float(os.environ.get('CANTEEN_FAKE_GATEWAY_DECLINE_RATE', 0.0))
+        )
+    return PaymentManager()
+
+
+class PaymentProcessor:
+    """Captures payments for pending orders on a background worker pool.
+
+    Orders are created as 'pending_payment'; submit() returns immediately
+    and a worker captures the payment (with a per-attempt timeout and
+    retries, keyed by order_id for idempotency), then flips the order to
+    'placed' or 'payment_failed' through the DatabaseManager.
+
+    If recording the outcome fails (e.g. a database error) the order stays
+    pending_payment and is picked up again by resume_pending().
+    """
+
+    def __init__(self, db, gateway, workers=4, timeout=10.0, max_attempts=3, backoff=0.5):
+        self.db = db
+        self.gateway = gateway
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='payment')
+        # Gateway calls run here so a hung call can be abandoned after timeout
+        self._calls = ThreadPoolExecutor(max_workers=workers * 2, thread_name_prefix='gateway')
+
+    def submit(self, order_id, amount):
+        """Queue payment capture for an order; returns a Future of the final status"""
+        future = self._workers.submit(self._process, order_id, amount)
+        # Callers rarely wait on the Future; make sure errors are not lost with it
+        future.add_done_callback(_log_failure)
+        return future
+
+    def resume_pending(self):
+        """Resubmit orders left in pending_payment, e.g. after a restart"""
+        return [self.submit(order_id, amount)
+                for order_id, amount in self.db.get_pending_payments()]
+
+    def _process(self, order_id, amount):
+        reason = 'gateway unavailable'
+        for attempt in range(self.max_attempts):
+            call = self._calls.submit(self.gateway.capture, amount, order_id)
+            try:
+                payment_id = call.result(timeout=self.timeout)
+            except PaymentError as e:
+                reason = str(e)
+                break
+            except (FutureTimeout, TimeoutError, ConnectionError) as e:
+                reason = str(e) or 'gateway timeout'
+                if attempt + 1 < self.max_attempts:
+                    time.sleep(self.backoff * 2 ** attempt)
+                continue
+            except Exception as e:
+                # A gateway bug is not worth retrying; release the stock
+                log.exception("Payment capture for %s failed unexpectedly", order_id)
+                reason = f"unexpected error: {e!r}"
+                break
+            self.db.confirm_payment(order_id, payment_id)
+            return 'placed'
+
+        self.db.fail_payment(order_id, reason)
+        return 'payment_failed'
+
+    def shutdown(self, wait=True):
+        self._workers.shutdown(wait=wait)
+        self._calls.shutdown(wait=wait)
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        log.error("Payment processing failed; the order stays pending until resumed",
+                  exc_info=future.exception())
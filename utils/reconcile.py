@@ -0,0 +1,66 @@
+"""Batch reconciliation of gateway settlements against orders.
+
+Settlements are pulled page by page from the gateway's list_settlements(),
+then matched against orders by payment_id in bulk (one indexed join plus
+pandas set operations), so a full day reconciles in a handful of queries.
+"""
+import pandas as pd
+
+PAGE_SIZE = 500
+
+# Amounts closer than this (in rupees) are treated as equal
+AMOUNT_TOLERANCE = 0.005
+
+SETTLEMENT_COLUMNS = ['payment_id', 'amount', 'reference', 'captured_at']
+
+
+def fetch_settlements(gateway, start, end, page_size=PAGE_SIZE):
+    """All settlements captured in [start, end) as a DataFrame"""
+    rows, cursor = [], None
+    while True:
+        page, cursor = gateway.list_settlements(start, end, cursor=cursor, page_size=page_size)
+        rows.extend(page)
+        if cursor is None:
+            break
+    return pd.DataFrame(rows, columns=SETTLEMENT_COLUMNS)
+
+
+def reconcile(db, gateway, start, end, page_size=PAGE_SIZE):
+    """Compare the gateway's settlements in [start, end) with the orders table.
+
+    Returns a dict of counts plus DataFrames:
+      unmatched_settlements  captured by the gateway, no order carries the payment_id
+      missing_settlements    paid online orders in the window with no settlement
+      duplicate_settlements  payment_id or reference (order ID) settled more than once
+      duplicate_orders       payment_id recorded on more than one order
+      amount_mismatches      settled amount differs from the order total
+    """
+    settlements = fetch_settlements(gateway, start, end, page_size)
+    orders = db.get_orders_by_payment_ids(settlements['payment_id'].unique().tolist())
+    paid = db.get_paid_orders(start, end)
+
+    duplicate_settlements = settlements[
+        settlements.duplicated('payment_id', keep=False)
+        | settlements.duplicated('reference', keep=False)
+    ]
+    duplicate_orders = orders[orders.duplicated('payment_id', keep=False)]
+
+    merged = settlements.drop_duplicates('payment_id').merge(
+        orders.drop_duplicates('payment_id'), on='payment_id', how='left', indicator=True)
+    matched = merged[merged['_merge'] == 'both']
+    unmatched = merged[merged['_merge'] == 'left_only'][SETTLEMENT_COLUMNS]
+    mismatched = matched[
+        (matched['amount'] - matched['total_amount']).abs() > AMOUNT_TOLERANCE
+    ][['payment_id', 'order_id', 'amount', 'total_amount']]
+    missing = paid[~paid['payment_id'].isin(settlements['payment_id'])]
+
+    return {
+        'settlements': len(settlements),
+        'paid_orders': len(paid),
+        'matched': len(matched),
+        'unmatched_settlements': unmatched.reset_index(drop=True),
+        'missing_settlements': missing.reset_index(drop=True),
+        'duplicate_settlements': duplicate_settlements.reset_index(drop=True),
+        'duplicate_orders': duplicate_orders.reset_index(drop=True),
+        'amount_mismatches': mismatched.reset_index(drop=True),
+    }